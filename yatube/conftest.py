@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+# Same as core.budgets.MS_FACTOR_ENV, settings are not ready here yet.
+MS_FACTOR_ENV = 'YATUBE_BUDGET_MS_FACTOR'
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--budget-ms-factor',
+        type=float,
+        help='Scale time budgets of budgets.json, 0 turns them off.',
+    )
+
+
+def pytest_configure(config):
+    factor = config.getoption('--budget-ms-factor')
+    if factor is not None:
+        os.environ[MS_FACTOR_ENV] = str(factor)
+
+
+@pytest.fixture
+def budget(db):
+    """Check block against per-view budget.
+
+    def test_index(client, budget):
+        with budget('posts:index'):
+            client.get('/')
+    """
+    from core.budgets import within_budget
+    return within_budget
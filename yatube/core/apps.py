@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        """Hook templates and caches into request metrics."""
+        from django.conf import settings
+
+        if settings.METRICS_ENABLED:
+            from . import metrics
+            metrics.install()
@@ -0,0 +1,84 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+BUDGETS_FILE = os.path.join(settings.BASE_DIR, 'budgets.json')
+# Scale of time budgets: >1 for slow CI machines, 0 turns them off.
+MS_FACTOR_ENV = 'YATUBE_BUDGET_MS_FACTOR'
+
+
+class BudgetExceeded(AssertionError):
+    """Request used more queries or time than its budget allows."""
+
+
+class RequestRecord:
+    """Queries and wall time of recorded block."""
+
+    def __init__(self):
+        self.queries = []
+        self.elapsed_ms = None
+
+    def __repr__(self):
+        return (
+            f'<RequestRecord {len(self.queries)} queries, '
+            f'{self.elapsed_ms:.1f} ms>'
+        )
+
+
+@contextmanager
+def record():
+    """Record queries and wall time of the block."""
+    result = RequestRecord()
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        yield result
+        result.elapsed_ms = (time.perf_counter() - started) * 1000
+    result.queries = queries.captured_queries
+
+
+@lru_cache(maxsize=None)
+def load(path=BUDGETS_FILE):
+    with open(path) as file:
+        return json.load(file)
+
+
+def ms_factor():
+    return float(os.getenv(MS_FACTOR_ENV, 1))
+
+
+def check(name, result, budgets=None, factor=None):
+    """Raise BudgetExceeded if recorded request broke budget of name."""
+    budget = (budgets or load())['views'][name]
+    factor = ms_factor() if factor is None else factor
+    problems = []
+    if len(result.queries) > budget['queries']:
+        problems.append(
+            f'{len(result.queries)} queries, budget {budget["queries"]}:\n'
+            + '\n'.join(query['sql'] for query in result.queries)
+        )
+    limit = budget['ms'] * factor
+    if factor and result.elapsed_ms > limit:
+        problems.append(f'{result.elapsed_ms:.1f} ms, budget {limit:.0f} ms')
+    if problems:
+        raise BudgetExceeded(f'{name}: ' + '\n'.join(problems))
+
+
+@contextmanager
+def within_budget(name):
+    """Record the block and check it against budget of name."""
+    with record() as result:
+        yield result
+    check(name, result)
+
+
+class BudgetTestMixin:
+    """assertWithinBudget for TestCase, budgets come from budgets.json."""
+
+    def assertWithinBudget(self, name):
+        return within_budget(name)
@@ -0,0 +1,269 @@
+import pickle
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+from urllib.parse import urlsplit
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+    'pylibmc': 'django.core.cache.backends.memcached.PyLibMCCache',
+    'redis': 'django_redis.cache.RedisCache',
+}
+TIERED_PREFIX = 'tiered+'
+SEQUENCE_KEY = 'two_tier:sequence'
+LOG_KEY = 'two_tier:log:{}'
+# Log entries outlive the sync interval of every worker by this much
+LOG_TIMEOUT = 300
+
+_missing = object()
+
+
+def backend_config(url):
+    """Build one CACHES entry from url like file:///tmp/yatube."""
+    parts = urlsplit(url)
+    if parts.scheme not in BACKENDS:
+        raise ValueError(f'Unknown cache backend: {url}')
+    config = {'BACKEND': BACKENDS[parts.scheme]}
+    if parts.scheme == 'file':
+        config['LOCATION'] = parts.path
+    elif parts.scheme == 'redis':
+        config['LOCATION'] = url
+    elif parts.scheme != 'locmem':
+        config['LOCATION'] = parts.netloc.split(',')
+    else:
+        config['LOCATION'] = parts.netloc
+    return config
+
+
+def cache_config(url, local_max_entries=1000, sync_interval=1):
+    """Build CACHES setting from cache url.
+
+    'tiered+<url>' puts an in-process LRU in front of <url>, which is
+    registered as the 'shared' alias.
+    """
+    if not url.startswith(TIERED_PREFIX):
+        return {'default': backend_config(url)}
+    return {
+        'default': {
+            'BACKEND': 'core.cache.TwoTierCache',
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'MAX_ENTRIES': local_max_entries,
+                'SYNC_INTERVAL': sync_interval,
+            },
+        },
+        'shared': backend_config(url[len(TIERED_PREFIX):]),
+    }
+
+
+class TwoTierCache(BaseCache):
+    """Process-local LRU in front of a shared cache.
+
+    Writes append the keys they change to an invalidation log in the
+    shared cache. At most every SYNC_INTERVAL seconds a worker reads
+    the log entries written since its last sync and forgets only those
+    keys. A gap in the log, e.g. expired entries, drops the whole local
+    tier. Local copies live at most LOCAL_TIMEOUT seconds, so a missed
+    invalidation is never served for longer than that.
+
+    The shared backend should have atomic incr, like memcached or
+    redis, so that concurrent writers never share a log entry.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        super().__init__({
+            **params,
+            'OPTIONS': {'MAX_ENTRIES': options.get('MAX_ENTRIES', 1000)},
+        })
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._sync_interval = options.get('SYNC_INTERVAL', 1)
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 60)
+        self._log_size = options.get('LOG_SIZE', 1000)
+        self._shared = None
+        self._local = OrderedDict()
+        self._lock = Lock()
+        self._token = uuid.uuid4().hex
+        self._seen = None
+        self._synced_at = float('-inf')
+
+    @property
+    def shared(self):
+        if self._shared is None:
+            from django.core.cache import caches
+            self._shared = caches[self._shared_alias]
+        return self._shared
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self._synced_at < self._sync_interval:
+            return
+        self._synced_at = now
+        current = self.shared.get(SEQUENCE_KEY, 0)
+        seen, self._seen = self._seen, current
+        if current == seen:
+            return
+        keys = None
+        if seen is not None and 0 < current - seen <= self._log_size:
+            keys = self._changed_keys(range(seen + 1, current + 1))
+        with self._lock:
+            if keys is None:
+                self._local.clear()
+            else:
+                for key in keys:
+                    self._local.pop(key, None)
+
+    def _changed_keys(self, numbers):
+        """Keys other workers changed in log entries, None if unknown."""
+        entries = self.shared.get_many(
+            [LOG_KEY.format(number) for number in numbers]
+        )
+        keys = []
+        for number in numbers:
+            entry = entries.get(LOG_KEY.format(number))
+            if entry is None or entry[1] is None:
+                return None
+            token, changed = entry
+            if token != self._token:
+                keys.extend(changed)
+        return keys
+
+    def _broadcast(self, keys):
+        """Log changed local keys, None for all of them."""
+        try:
+            number = self.shared.incr(SEQUENCE_KEY)
+        except ValueError:
+            # Start far from numbers seen before a flush of the shared
+            # cache, so workers notice the gap and drop their tier.
+            self.shared.add(SEQUENCE_KEY, time.time_ns(), None)
+            number = self.shared.incr(SEQUENCE_KEY)
+        self.shared.set(
+            LOG_KEY.format(number),
+            (self._token, keys),
+            self._sync_interval + LOG_TIMEOUT,
+        )
+
+    def _remember(self, key, value, timeout):
+        expires = time.time() + self._local_timeout
+        backend_expires = self.get_backend_timeout(timeout)
+        if backend_expires is not None:
+            expires = min(expires, backend_expires)
+        with self._lock:
+            if len(self._local) >= self._max_entries:
+                self._local.popitem(last=False)
+            self._local[key] = (
+                pickle.dumps(value, self.pickle_protocol), expires
+            )
+            self._local.move_to_end(key)
+
+    def _forget(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    def _cached(self, local_key):
+        """Local value of key, or _missing."""
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return _missing
+            pickled, expires = entry
+            if expires > time.time():
+                self._local.move_to_end(local_key)
+                return pickle.loads(pickled)
+            del self._local[local_key]
+        return _missing
+
+    def get(self, key, default=None, version=None):
+        self._sync()
+        local_key = self.make_key(key, version=version)
+        value = self._cached(local_key)
+        if value is not _missing:
+            return value
+        value = self.shared.get(key, _missing, version=version)
+        if value is _missing:
+            return default
+        self._remember(local_key, value, DEFAULT_TIMEOUT)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        misses = []
+        for key in keys:
+            value = self._cached(self.make_key(key, version=version))
+            if value is _missing:
+                misses.append(key)
+            else:
+                found[key] = value
+        if misses:
+            fetched = self.shared.get_many(misses, version=version)
+            for key, value in fetched.items():
+                self._remember(
+                    self.make_key(key, version=version), value,
+                    DEFAULT_TIMEOUT,
+                )
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_key(key, version=version)
+        self.shared.set(key, value, timeout, version=version)
+        self._broadcast([local_key])
+        self._remember(local_key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            local_key = self.make_key(key, version=version)
+            self._broadcast([local_key])
+            self._remember(local_key, value, timeout)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        local_keys = {
+            key: self.make_key(key, version=version) for key in data
+        }
+        self._broadcast(list(local_keys.values()))
+        for key, value in data.items():
+            self._remember(local_keys[key], value, timeout)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._forget(self.make_key(key, version=version))
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        local_key = self.make_key(key, version=version)
+        self.shared.delete(key, version=version)
+        self._broadcast([local_key])
+        self._forget(local_key)
+
+    def delete_many(self, keys, version=None):
+        local_keys = [self.make_key(key, version=version) for key in keys]
+        self.shared.delete_many(keys, version=version)
+        self._broadcast(local_keys)
+        self._forget(*local_keys)
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self.make_key(key, version=version)
+        value = self.shared.incr(key, delta, version=version)
+        self._broadcast([local_key])
+        self._forget(local_key)
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version=version) is not self
+
+    def clear(self):
+        self.shared.clear()
+        self._broadcast(None)
+        with self._lock:
+            self._local.clear()
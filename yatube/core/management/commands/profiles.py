@@ -0,0 +1,94 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import profiler
+
+
+class Command(BaseCommand):
+    help = 'List slowest captured request profiles or show one of them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile_id', nargs='?',
+                            help='Show summary of this profile.')
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--view', help='Only profiles of this view.')
+
+    def handle(self, *args, **options):
+        profiles = profiler.load_all()
+        if options['profile_id']:
+            found = [
+                meta for meta in profiles
+                if meta['id'] == options['profile_id']
+            ]
+            if not found:
+                raise CommandError(
+                    f'Profile {options["profile_id"]} not found.'
+                )
+            self.print_profile(found[0], options['limit'])
+            return
+        if options['view']:
+            profiles = [
+                meta for meta in profiles if meta['view'] == options['view']
+            ]
+        profiles.sort(key=lambda meta: meta['elapsed_ms'], reverse=True)
+        self.print_list(profiles[:options['limit']])
+        if profiles:
+            views = Counter(meta['view'] for meta in profiles)
+            self.stdout.write('\nCaptured per view: ' + ', '.join(
+                f'{view} {count}' for view, count in views.most_common()
+            ))
+
+    def print_list(self, profiles):
+        if not profiles:
+            self.stdout.write('No profiles captured.')
+            return
+        self.stdout.write(
+            f'{"id":<28} {"ms":>9} {"sql ms":>9} {"queries":>7} '
+            f'{"mode":<8} view'
+        )
+        for meta in profiles:
+            self.stdout.write(
+                f'{meta["id"]:<28} {meta["elapsed_ms"]:>9.1f} '
+                f'{meta["sql_ms"]:>9.1f} {len(meta["queries"]):>7} '
+                f'{meta["mode"]:<8} {meta["view"]} {meta["path"]}'
+            )
+
+    def print_profile(self, meta, limit):
+        self.stdout.write(
+            f'{meta["method"]} {meta["path"]} -> {meta["status"]}, '
+            f'view {meta["view"]}, {meta["elapsed_ms"]:.1f} ms, '
+            f'captured {meta["captured"]} by {meta["mode"]}'
+        )
+        queries = meta['queries']
+        self.stdout.write(
+            f'\nSQL: {len(queries)} queries, {meta["sql_ms"]:.1f} ms'
+        )
+        repeated = Counter(query['sql'] for query in queries)
+        for query in sorted(queries, key=lambda q: q['ms'], reverse=True)[
+            :limit
+        ]:
+            self.stdout.write(
+                f'{query["ms"]:>9.3f} ms  x{repeated[query["sql"]]}  '
+                f'{query["sql"]}'
+            )
+        if meta['mode'] == profiler.CPROFILE:
+            self.stdout.write('\nFunctions by cumulative time:')
+            self.stdout.write(profiler.top_functions(meta['id'], limit))
+            return
+        stacks = meta.get('stacks', {})
+        total = sum(stacks.values())
+        self.stdout.write(f'\nStack samples: {total}')
+        if not total:
+            return
+        leaves = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        self.stdout.write('Hottest frames:')
+        for frame, count in leaves.most_common(limit):
+            self.stdout.write(f'{count / total:>7.1%}  {frame}')
+        stack, count = next(iter(stacks.items()))
+        self.stdout.write(
+            f'Most frequent stack ({count / total:.1%}):\n  '
+            + '\n  '.join(stack.split(';'))
+        )
@@ -0,0 +1,336 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+TIME_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+METRICS = {
+    'yatube_requests_total': (
+        'counter', 'Requests by view and status class.', None),
+    'yatube_request_duration_seconds': (
+        'histogram', 'Request wall time.', TIME_BUCKETS),
+    'yatube_db_queries': (
+        'histogram', 'Database queries per request.', COUNT_BUCKETS),
+    'yatube_db_duration_seconds': (
+        'histogram', 'Database time per request.', TIME_BUCKETS),
+    'yatube_template_duration_seconds': (
+        'histogram', 'Template render time per request.', TIME_BUCKETS),
+    'yatube_cache_requests_total': (
+        'counter', 'Cache lookups by backend and result.', None),
+}
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_request = threading.local()
+_missing = object()
+
+
+class Registry:
+    """In-process counters and histograms, safe for threaded workers."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [
+                    [0] * (len(buckets) + 1), 0.0
+                ]
+            histogram[0][bisect_left(buckets, value)] += 1
+            histogram[1] += value
+
+    def snapshot(self):
+        """Plain data copy, ready for JSON and merge."""
+        with self.lock:
+            return {
+                'counters': [
+                    [name, list(labels), value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                'histograms': [
+                    [name, list(labels), list(counts), total]
+                    for (name, labels), (counts, total)
+                    in self.histograms.items()
+                ],
+            }
+
+
+registry = Registry()
+
+
+def merge(snapshots):
+    """Sum snapshots of several workers into one registry."""
+    merged = Registry()
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            merged.inc(name, tuple(map(tuple, labels)), value)
+        for name, labels, counts, total in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            histogram = merged.histograms.setdefault(
+                key, [[0] * len(counts), 0.0]
+            )
+            histogram[0] = [a + b for a, b in zip(histogram[0], counts)]
+            histogram[1] += total
+    return merged
+
+
+def _labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(
+            key,
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'),
+        )
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def exposition(source):
+    """Prometheus text format of registry."""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(source.counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+            continue
+        for (metric, labels), (counts, total) in sorted(
+            source.histograms.items()
+        ):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), counts):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(
+                    name, _labels(labels, [('le', bound)]), cumulative
+                ))
+            lines.append(f'{name}_sum{_labels(labels)} {total}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class RequestStats:
+    """Counters of request in progress, filled by hooks."""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.cache = {}
+        self.cache_depth = 0
+
+
+def start_request(stats=None):
+    """Collect stats of request in this thread, resumes given stats."""
+    _request.stats = RequestStats() if stats is None else stats
+    return _request.stats
+
+
+def finish_request():
+    _request.stats = None
+
+
+def current():
+    return getattr(_request, 'stats', None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting queries and their time."""
+    stats = current()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def record_cache(backend, hits, misses):
+    stats = current()
+    if stats is None:
+        return
+    for result, count in (('hit', hits), ('miss', misses)):
+        if count:
+            key = (backend, result)
+            stats.cache[key] = stats.cache.get(key, 0) + count
+
+
+@contextmanager
+def rendering():
+    """Count time of the block as template render time of request."""
+    stats = current()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.template_seconds += time.perf_counter() - started
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, *args, **kwargs):
+        with rendering():
+            return render(self, *args, **kwargs)
+    return wrapper
+
+
+def _patch_cache(backend):
+    """Count hits and misses of outermost lookups on cache backend class.
+
+    Lookups made by a backend inside another one, like the shared tier
+    of TwoTierCache, are not counted twice.
+    """
+    if getattr(backend, '_metrics_installed', False):
+        return
+    get, get_many = backend.get, backend.get_many
+    name = backend.__name__
+
+    @wraps(get)
+    def counted_get(self, key, default=None, version=None):
+        stats = current()
+        if stats is None or stats.cache_depth:
+            return get(self, key, default, version)
+        stats.cache_depth += 1
+        try:
+            value = get(self, key, _missing, version)
+        finally:
+            stats.cache_depth -= 1
+        if value is _missing:
+            record_cache(name, 0, 1)
+            return default
+        record_cache(name, 1, 0)
+        return value
+
+    @wraps(get_many)
+    def counted_get_many(self, keys, version=None):
+        stats = current()
+        if stats is None or stats.cache_depth:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        stats.cache_depth += 1
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            stats.cache_depth -= 1
+        record_cache(name, len(found), len(keys) - len(found))
+        return found
+
+    backend.get = counted_get
+    backend.get_many = counted_get_many
+    backend._metrics_installed = True
+
+
+def install():
+    """Hook template rendering and cache backends into request stats."""
+    from django.template.backends.django import Template
+
+    if not getattr(Template, '_metrics_installed', False):
+        Template.render = _timed_render(Template.render)
+        Template._metrics_installed = True
+    for config in settings.CACHES.values():
+        _patch_cache(import_string(config['BACKEND']))
+
+
+def observe_request(view, status, seconds, stats):
+    labels = (('view', view),)
+    registry.inc(
+        'yatube_requests_total',
+        labels + (('status', f'{status // 100}xx'),),
+    )
+    registry.observe('yatube_request_duration_seconds', labels, seconds)
+    registry.observe('yatube_db_queries', labels, stats.db_queries)
+    registry.observe('yatube_db_duration_seconds', labels, stats.db_seconds)
+    registry.observe(
+        'yatube_template_duration_seconds', labels, stats.template_seconds
+    )
+    for (backend, result), count in stats.cache.items():
+        registry.inc(
+            'yatube_cache_requests_total',
+            labels + (('backend', backend), ('result', result)),
+            count,
+        )
+
+
+def worker_file(pid=None):
+    return os.path.join(settings.METRICS_DIR, f'{pid or os.getpid()}.json')
+
+
+def flush():
+    """Share snapshot of this worker with the others."""
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = worker_file()
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(registry.snapshot(), file)
+    os.replace(temporary, path)
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect():
+    """Registry summed over live workers that flushed to METRICS_DIR.
+
+    Files of exited workers are removed, so their counters do not stay
+    in the totals after restarts.
+    """
+    snapshots = [registry.snapshot()]
+    if settings.METRICS_DIR and os.path.isdir(settings.METRICS_DIR):
+        own = os.path.basename(worker_file())
+        for name in os.listdir(settings.METRICS_DIR):
+            if not name.endswith('.json') or name == own:
+                continue
+            path = os.path.join(settings.METRICS_DIR, name)
+            pid = name[:-len('.json')]
+            if not pid.isdigit():
+                continue
+            if not alive(int(pid)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+    return merge(snapshots)
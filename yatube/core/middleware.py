@@ -0,0 +1,219 @@
+import cProfile
+import logging
+import os
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+from . import metrics, profiler, routers
+
+METRICS_VIEW = 'metrics'
+
+logger = logging.getLogger(__name__)
+
+
+class PrimaryStickinessMiddleware:
+    """Read-your-writes for database replicas.
+
+    A client that has just written reads from the primary until the
+    cookie expires, so replica lag never hides its own changes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.reset()
+        if settings.REPLICA_STICKY_COOKIE in request.COOKIES:
+            routers.pin_to_primary()
+        try:
+            response = self.get_response(request)
+            if routers.wrote():
+                response.set_cookie(
+                    settings.REPLICA_STICKY_COOKIE,
+                    '1',
+                    max_age=settings.REPLICA_STICKY_SECONDS,
+                    httponly=True,
+                )
+        finally:
+            routers.reset()
+        return response
+
+
+class MetricsMiddleware:
+    """Per-view wall, database, template and cache stats of requests.
+
+    Goes first in MIDDLEWARE, so the time of all others is counted too.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.flushed = time.monotonic()
+        if settings.METRICS_DIR:
+            # Reset file an earlier process left under the same pid
+            self.write()
+
+    def __call__(self, request):
+        stats = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            with self.capture():
+                response = self.get_response(request)
+        finally:
+            metrics.finish_request()
+        if response.streaming:
+            response.streaming_content = self.measure_stream(
+                request, response, stats, started
+            )
+            return response
+        self.observe(request, response, stats, started)
+        return response
+
+    @contextmanager
+    def capture(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(metrics.record_query)
+                )
+            yield
+
+    def measure_stream(self, request, response, stats, started):
+        """Streamed body, its queries and time counted with the request."""
+        chunks = response.streaming_content
+
+        def measured():
+            metrics.start_request(stats)
+            try:
+                with self.capture():
+                    yield from chunks
+            finally:
+                metrics.finish_request()
+                self.observe(request, response, stats, started)
+        return measured()
+
+    def observe(self, request, response, stats, started):
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        if view != METRICS_VIEW:
+            metrics.observe_request(
+                view,
+                response.status_code,
+                time.perf_counter() - started,
+                stats,
+            )
+        self.flush()
+
+    def flush(self):
+        if not settings.METRICS_DIR:
+            return
+        now = time.monotonic()
+        if now - self.flushed < settings.METRICS_FLUSH_SECONDS:
+            return
+        self.flushed = now
+        self.write()
+
+    @staticmethod
+    def write():
+        try:
+            metrics.flush()
+        except OSError:
+            logger.exception('Metrics flush failed')
+
+
+class ProfilerMiddleware:
+    """Save profiles of sampled and slow requests to PROFILER_DIR.
+
+    PROFILER_SAMPLE_RATE of requests run under cProfile. Other requests
+    are watched by the stack sampler and kept if they take longer than
+    PROFILER_SLOW_MS.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = None
+        if random.random() < settings.PROFILER_SAMPLE_RATE:
+            profile = cProfile.Profile()
+        watch = profile is None and settings.PROFILER_SLOW_MS is not None
+        stacks = Counter() if watch else None
+        queries = profiler.QueryLog()
+        started = time.perf_counter()
+        with self.capture(profile, stacks, queries):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.capture_stream(
+                request, response, profile, stacks, queries, started
+            )
+            return response
+        self.save(request, response, profile, stacks, queries, started)
+        return response
+
+    @contextmanager
+    def capture(self, profile, stacks, queries):
+        if stacks is not None:
+            profiler.sampler.start(stacks)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(queries))
+                if profile is not None:
+                    profile.enable()
+                try:
+                    yield
+                finally:
+                    if profile is not None:
+                        profile.disable()
+        finally:
+            if stacks is not None:
+                profiler.sampler.stop()
+
+    def capture_stream(self, request, response, profile, stacks, queries,
+                       started):
+        """Streamed body, profiled together with the request."""
+        chunks = response.streaming_content
+
+        def captured():
+            try:
+                with self.capture(profile, stacks, queries):
+                    yield from chunks
+            finally:
+                self.save(
+                    request, response, profile, stacks, queries, started
+                )
+        return captured()
+
+    def save(self, request, response, profile, stacks, queries, started):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if profile is None and not (
+            stacks is not None and elapsed_ms >= settings.PROFILER_SLOW_MS
+        ):
+            return
+        match = request.resolver_match
+        meta = {
+            'view': match.view_name if match else '<unresolved>',
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'elapsed_ms': round(elapsed_ms, 3),
+            'mode': profiler.SAMPLER if profile is None else profiler.CPROFILE,
+            'captured': timezone.now().isoformat(),
+            'pid': os.getpid(),
+            'sql_ms': round(sum(query['ms'] for query in queries.queries), 3),
+            'queries': queries.queries,
+        }
+        try:
+            profiler.save(meta, profile, stacks)
+        except OSError:
+            logger.exception('Saving profile of %s failed', meta['path'])
@@ -0,0 +1,152 @@
+import io
+import itertools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+CPROFILE = 'cprofile'
+SAMPLER = 'sampler'
+MAX_DEPTH = 64
+
+_sequence = itertools.count()
+
+
+def collapse(frame):
+    """Stack of frame as 'outer;...;inner' line, flame graph style."""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        names.append(
+            f'{code.co_name} ({os.path.basename(code.co_filename)}'
+            f':{frame.f_lineno})'
+        )
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """Background thread sampling stacks of requests in progress.
+
+    Costs one sys._current_frames call per interval for the whole
+    worker, requests themselves only register and unregister.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = {}
+        self.thread = None
+
+    def start(self, stacks=None):
+        """Sample this thread into stacks, a new Counter by default."""
+        if stacks is None:
+            stacks = Counter()
+        with self.lock:
+            self.active[threading.get_ident()] = stacks
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name='profiler-sampler', daemon=True
+                )
+                self.thread.start()
+        return stacks
+
+    def stop(self):
+        with self.lock:
+            return self.active.pop(threading.get_ident(), Counter())
+
+    def run(self):
+        while True:
+            time.sleep(settings.PROFILER_INTERVAL)
+            frames = sys._current_frames()
+            with self.lock:
+                for ident, stacks in self.active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        stacks[collapse(frame)] += 1
+
+
+sampler = Sampler()
+
+
+class QueryLog:
+    """Database execute wrapper keeping SQL and time of statements."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < settings.PROFILER_MAX_QUERIES:
+                self.queries.append({
+                    'sql': sql,
+                    'ms': round((time.perf_counter() - started) * 1000, 3),
+                })
+
+
+def profile_path(name):
+    return os.path.join(settings.PROFILER_DIR, name)
+
+
+def save(meta, profile=None, stacks=None):
+    """Write captured request to PROFILER_DIR, return its id."""
+    os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+    profile_id = '{}-{}-{}'.format(
+        int(time.time() * 1000), os.getpid(), next(_sequence)
+    )
+    if profile is not None:
+        profile.dump_stats(profile_path(f'{profile_id}.prof'))
+    if stacks:
+        meta['stacks'] = dict(stacks.most_common())
+    with open(profile_path(f'{profile_id}.json'), 'w') as file:
+        json.dump(meta, file)
+    prune()
+    return profile_id
+
+
+def prune():
+    """Keep only PROFILER_KEEP newest profiles."""
+    names = sorted(
+        name for name in os.listdir(settings.PROFILER_DIR)
+        if name.endswith('.json')
+    )
+    for name in names[:max(len(names) - settings.PROFILER_KEEP, 0)]:
+        stem = name[:-len('.json')]
+        for extension in ('.json', '.prof'):
+            try:
+                os.remove(profile_path(stem + extension))
+            except FileNotFoundError:
+                pass
+
+
+def load_all():
+    """Metadata of every saved profile, with its id."""
+    if not os.path.isdir(settings.PROFILER_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(settings.PROFILER_DIR):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(profile_path(name)) as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            continue
+        meta['id'] = name[:-len('.json')]
+        profiles.append(meta)
+    return profiles
+
+
+def top_functions(profile_id, limit):
+    """pstats report of functions with most cumulative time."""
+    output = io.StringIO()
+    stats = pstats.Stats(profile_path(f'{profile_id}.prof'), stream=output)
+    stats.sort_stats('cumulative').print_stats(limit)
+    return output.getvalue()
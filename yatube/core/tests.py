@@ -0,0 +1,582 @@
+import importlib
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Post
+
+from . import budgets, metrics, profiler, routers
+from .cache import SEQUENCE_KEY, backend_config, cache_config
+from .middleware import MetricsMiddleware, PrimaryStickinessMiddleware
+
+User = get_user_model()
+CACHE_DIR = tempfile.mkdtemp()
+WORKER_OPTIONS = {
+    'BACKEND': 'core.cache.TwoTierCache',
+    'OPTIONS': {'SHARED': 'shared', 'SYNC_INTERVAL': 0},
+}
+
+
+class CacheConfigTests(SimpleTestCase):
+    """Test cache url parsing."""
+
+    def test_plain_backends(self):
+        """Test single backend urls."""
+        self.assertEqual(
+            backend_config('file:///tmp/yatube')['LOCATION'], '/tmp/yatube'
+        )
+        self.assertEqual(
+            backend_config('memcached://a:11211,b:11211')['LOCATION'],
+            ['a:11211', 'b:11211'],
+        )
+        with self.assertRaises(ValueError):
+            backend_config('unknown://')
+
+    def test_tiered_backend(self):
+        """Test tiered url registers shared alias."""
+        config = cache_config('tiered+file:///tmp/yatube')
+        self.assertEqual(
+            config['default']['BACKEND'], WORKER_OPTIONS['BACKEND']
+        )
+        self.assertEqual(
+            config['shared'], backend_config('file:///tmp/yatube')
+        )
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': backend_config(f'file://{CACHE_DIR}'),
+    'worker_a': WORKER_OPTIONS,
+    'worker_b': WORKER_OPTIONS,
+    'worker_lazy': {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {'SHARED': 'shared', 'SYNC_INTERVAL': 60},
+    },
+    'worker_short': {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared', 'SYNC_INTERVAL': 0, 'LOCAL_TIMEOUT': 0.05,
+        },
+    },
+})
+class TwoTierCacheTests(SimpleTestCase):
+    """Test two workers over one file cache."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.worker_a = caches['worker_a']
+        self.worker_b = caches['worker_b']
+        self.worker_a.clear()
+
+    def test_value_shared_between_workers(self):
+        """Test value written by one worker is read by another."""
+        self.worker_a.set('key', 'value')
+        self.assertEqual(self.worker_b.get('key'), 'value')
+        self.assertEqual(caches['shared'].get('key'), 'value')
+
+    def test_write_invalidates_other_worker(self):
+        """Test local tier of other worker is dropped on write."""
+        self.worker_a.set('key', 'old')
+        self.assertEqual(self.worker_b.get('key'), 'old')
+        self.worker_a.set('key', 'new')
+        self.assertEqual(self.worker_b.get('key'), 'new')
+        self.worker_a.delete('key')
+        self.assertIsNone(self.worker_b.get('key'))
+
+    def test_local_tier_serves_repeated_reads(self):
+        """Test repeated read does not hit shared value."""
+        self.worker_b.set('key', 'value')
+        self.assertEqual(self.worker_a.get('key'), 'value')
+        caches['shared'].set('key', 'changed behind cache')
+        self.assertEqual(self.worker_a.get('key'), 'value')
+
+    def test_write_keeps_unrelated_local_keys(self):
+        """Test write drops only its own key from other workers."""
+        self.worker_a.set('kept', 'local')
+        self.assertEqual(self.worker_b.get('kept'), 'local')
+        caches['shared'].set('kept', 'changed behind cache')
+        self.worker_a.set('other', 'value')
+        self.assertEqual(self.worker_b.get('other'), 'value')
+        self.assertEqual(self.worker_b.get('kept'), 'local')
+
+    def test_get_many_fetches_misses_at_once(self):
+        """Test get_many reads local hits and one batch from shared."""
+        self.worker_a.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.worker_b.get('a')
+        shared = caches['shared']
+        with mock.patch.object(
+            shared, 'get_many', wraps=shared.get_many
+        ) as get_many, mock.patch.object(
+            shared, 'get', wraps=shared.get
+        ) as get:
+            self.assertEqual(
+                self.worker_b.get_many(['a', 'b', 'c', 'd']),
+                {'a': 1, 'b': 2, 'c': 3},
+            )
+        self.assertEqual(
+            [call.args[0] for call in get_many.call_args_list
+             if 'b' in call.args[0]],
+            [['b', 'c', 'd']],
+        )
+        self.assertEqual(
+            [call.args[0] for call in get.call_args_list].count(
+                SEQUENCE_KEY
+            ),
+            1,
+        )
+
+    def test_sync_interval_spares_shared_reads(self):
+        """Test local hits between syncs do not touch shared cache."""
+        worker = caches['worker_lazy']
+        self.worker_a.set('key', 'value')
+        self.assertEqual(worker.get('key'), 'value')
+        shared = caches['shared']
+        with mock.patch.object(shared, 'get') as get, \
+                mock.patch.object(shared, 'get_many') as get_many:
+            for _ in range(3):
+                self.assertEqual(worker.get('key'), 'value')
+        get.assert_not_called()
+        get_many.assert_not_called()
+
+    def test_local_copies_expire(self):
+        """Test local copy is dropped after LOCAL_TIMEOUT."""
+        worker = caches['worker_short']
+        self.worker_a.set('key', 'value')
+        self.assertEqual(worker.get('key'), 'value')
+        caches['shared'].set('key', 'changed behind cache')
+        time.sleep(0.1)
+        self.assertEqual(worker.get('key'), 'changed behind cache')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    """Test read/write routing and read-your-writes stickiness."""
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+        routers.reset()
+
+    def tearDown(self):
+        routers.reset()
+
+    def test_reads_go_to_replicas_writes_to_primary(self):
+        """Test reads use replicas until the first write."""
+        self.assertIn(self.router.db_for_read(None), ['replica1', 'replica2'])
+        self.assertEqual(self.router.db_for_write(None), routers.PRIMARY)
+        self.assertEqual(self.router.db_for_read(None), routers.PRIMARY)
+
+    def test_migrations_only_on_primary(self):
+        """Test replicas are never migrated."""
+        self.assertTrue(self.router.allow_migrate(routers.PRIMARY, 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+    def test_sticky_cookie_after_write(self):
+        """Test client reads from primary right after its write."""
+        reads = []
+
+        def view(request):
+            reads.append(self.router.db_for_read(None))
+            if request.method == 'POST':
+                self.router.db_for_write(None)
+            return HttpResponse()
+
+        middleware = PrimaryStickinessMiddleware(view)
+        response = middleware(self.factory.post('/'))
+        cookie = response.cookies[settings.REPLICA_STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+        request = self.factory.get('/')
+        request.COOKIES[settings.REPLICA_STICKY_COOKIE] = cookie.value
+        middleware(request)
+        middleware(self.factory.get('/'))
+        self.assertIn(reads[0], ['replica1', 'replica2'])
+        self.assertEqual(reads[1], routers.PRIMARY)
+        self.assertIn(reads[2], ['replica1', 'replica2'])
+        self.assertFalse(routers.is_pinned())
+
+
+REPLICA = 'replica_file'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaDatabaseTests(TransactionTestCase):
+    """Test routing against a replica in its own SQLite file.
+
+    The replica is a copy of the primary made by sync_replica(), rows
+    written after it stand for replication lag.
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'replica.sqlite3')
+        connections.databases[REPLICA] = {
+            **connections.databases[routers.PRIMARY], 'NAME': self.path,
+        }
+        self.addCleanup(connections.databases.pop, REPLICA)
+        self.addCleanup(self.close_replica)
+        routers.reset()
+        self.addCleanup(routers.reset)
+
+    @staticmethod
+    def close_replica():
+        connections[REPLICA].close()
+        del connections[REPLICA]
+
+    def sync_replica(self):
+        primary = connections[routers.PRIMARY]
+        primary.ensure_connection()
+        replica = sqlite3.connect(self.path)
+        try:
+            primary.connection.backup(replica)
+        finally:
+            replica.close()
+
+    def test_reads_follow_writes(self):
+        """Test reads use the replica file until the first write."""
+        User.objects.create(username='synced')
+        self.sync_replica()
+        routers.reset()
+        User.objects.create(username='lagging')
+        routers.reset()
+        self.assertEqual(User.objects.all().db, REPLICA)
+        self.assertEqual(
+            list(User.objects.values_list('username', flat=True)),
+            ['synced'],
+        )
+        User.objects.create(username='written')
+        self.assertEqual(User.objects.all().db, routers.PRIMARY)
+        self.assertEqual(
+            set(User.objects.values_list('username', flat=True)),
+            {'synced', 'lagging', 'written'},
+        )
+
+    def test_thumbnail_job_reads_primary(self):
+        """Test image job right after commit finds post on the primary."""
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        author = User.objects.create(username='author')
+        self.sync_replica()
+        buffer = BytesIO()
+        Image.new('RGB', (100, 100)).save(buffer, 'JPEG')
+        with self.settings(MEDIA_ROOT=media):
+            name = default_storage.save(
+                'posts/lag.jpg', ContentFile(buffer.getvalue())
+            )
+            post = Post.objects.create(author=author, text='Свежий пост')
+            Post.objects.filter(pk=post.pk).update(image=name)
+            worker = threading.Thread(
+                target=thumbnails._generate_in_worker, args=(post.pk,)
+            )
+            worker.start()
+            worker.join()
+        self.assertIsNotNone(
+            Post.objects.using(routers.PRIMARY).get(pk=post.pk).variants
+        )
+
+
+class BudgetTests(SimpleTestCase):
+    """Test query and time budgets check."""
+    budgets = {'views': {'page': {'queries': 1, 'ms': 100}}}
+
+    def result(self, queries, elapsed_ms):
+        result = budgets.RequestRecord()
+        result.queries = [{'sql': 'SELECT 1'}] * queries
+        result.elapsed_ms = elapsed_ms
+        return result
+
+    def test_within_budget(self):
+        """Test request within budget passes."""
+        budgets.check('page', self.result(1, 50), self.budgets, factor=1)
+
+    def test_too_many_queries(self):
+        """Test extra query fails and lists queries."""
+        with self.assertRaisesMessage(
+            budgets.BudgetExceeded, 'page: 2 queries, budget 1'
+        ):
+            budgets.check('page', self.result(2, 50), self.budgets, factor=1)
+
+    def test_time_factor(self):
+        """Test time budget is scaled and can be turned off."""
+        slow = self.result(1, 150)
+        with self.assertRaises(budgets.BudgetExceeded):
+            budgets.check('page', slow, self.budgets, factor=1)
+        budgets.check('page', slow, self.budgets, factor=2)
+        budgets.check('page', slow, self.budgets, factor=0)
+
+    def test_budgets_file(self):
+        """Test every budget has query and time limits."""
+        for name, budget in budgets.load()['views'].items():
+            with self.subTest(name=name):
+                self.assertEqual(set(budget), {'queries', 'ms'})
+
+
+class MetricsTests(TestCase):
+    """Test request metrics and their exposition."""
+
+    def setUp(self):
+        patcher = mock.patch.object(metrics, 'registry', metrics.Registry())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_histogram_exposition(self):
+        """Test buckets are cumulative and labels are escaped."""
+        labels = (('view', 'a"b'),)
+        metrics.registry.observe('yatube_db_queries', labels, 2)
+        metrics.registry.observe('yatube_db_queries', labels, 200)
+        text = metrics.exposition(metrics.registry)
+        self.assertIn('# TYPE yatube_db_queries histogram', text)
+        self.assertIn('yatube_db_queries_bucket{view="a\\"b",le="1"} 0', text)
+        self.assertIn('yatube_db_queries_bucket{view="a\\"b",le="3"} 1', text)
+        self.assertIn(
+            'yatube_db_queries_bucket{view="a\\"b",le="+Inf"} 2', text
+        )
+        self.assertIn('yatube_db_queries_sum{view="a\\"b"} 202', text)
+        self.assertIn('yatube_db_queries_count{view="a\\"b"} 2', text)
+
+    def test_request_stats(self):
+        """Test view name, queries, templates and cache are recorded."""
+        cache.clear()
+        self.client.get(reverse('posts:index')).getvalue()
+        self.client.get(reverse('posts:index')).getvalue()
+        registry = metrics.registry
+        labels = (('view', 'posts:index'),)
+        self.assertEqual(registry.counters[(
+            'yatube_requests_total', labels + (('status', '2xx'),)
+        )], 2)
+        counts, queries = registry.histograms[('yatube_db_queries', labels)]
+        self.assertGreater(queries, 0)
+        self.assertGreater(registry.histograms[(
+            'yatube_template_duration_seconds', labels
+        )][1], 0)
+        self.assertGreater(registry.counters[(
+            'yatube_cache_requests_total',
+            labels + (('backend', 'LocMemCache'), ('result', 'hit')),
+        )], 0)
+
+    @override_settings(STREAMING_PAGES=True)
+    def test_streamed_body_is_measured(self):
+        """Test queries of streamed chunks count with their request."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+            self.assertTrue(response.streaming)
+            self.assertEqual(metrics.registry.counters, {})
+            response.getvalue()
+        labels = (('view', 'posts:index'),)
+        self.assertEqual(metrics.registry.counters[(
+            'yatube_requests_total', labels + (('status', '2xx'),)
+        )], 1)
+        self.assertEqual(
+            metrics.registry.histograms[('yatube_db_queries', labels)][1],
+            len(queries),
+        )
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_page(self):
+        """Test metrics are served with the token only."""
+        self.client.get(reverse('posts:index')).getvalue()
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertContains(
+            response,
+            'yatube_requests_total{view="posts:index",status="2xx"} 1',
+        )
+        self.assertNotContains(response, 'view="metrics"')
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            with self.subTest(headers=headers):
+                response = self.client.get(
+                    reverse('metrics'), REMOTE_ADDR='127.0.0.1', **headers
+                )
+                self.assertEqual(response.status_code, 404)
+
+    def test_metrics_page_off_without_token(self):
+        """Test metrics page is not served when no token is set."""
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer None'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_workers_are_summed(self):
+        """Test snapshots flushed by other workers are added up."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        labels = (('view', 'posts:index'),)
+        metrics.registry.inc('yatube_requests_total', labels, 2)
+        other = metrics.Registry()
+        other.inc('yatube_requests_total', labels, 3)
+        with open(os.path.join(directory, '1.json'), 'w') as file:
+            json.dump(other.snapshot(), file)
+        with override_settings(METRICS_DIR=directory):
+            metrics.flush()
+            total = metrics.collect()
+        self.assertEqual(
+            total.counters[('yatube_requests_total', labels)], 5
+        )
+
+    def test_exited_workers_are_dropped(self):
+        """Test snapshot of exited worker is removed, not summed."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        process = subprocess.Popen(['true'])
+        process.wait()
+        labels = (('view', 'posts:index'),)
+        other = metrics.Registry()
+        other.inc('yatube_requests_total', labels, 3)
+        path = os.path.join(directory, f'{process.pid}.json')
+        with open(path, 'w') as file:
+            json.dump(other.snapshot(), file)
+        with override_settings(METRICS_DIR=directory):
+            total = metrics.collect()
+        self.assertNotIn(('yatube_requests_total', labels), total.counters)
+        self.assertFalse(os.path.exists(path))
+
+    def test_worker_file_reset_on_start(self):
+        """Test file left under the same pid is replaced on start."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        labels = (('view', 'posts:index'),)
+        old = metrics.Registry()
+        old.inc('yatube_requests_total', labels, 3)
+        with override_settings(METRICS_DIR=directory):
+            with open(metrics.worker_file(), 'w') as file:
+                json.dump(old.snapshot(), file)
+            MetricsMiddleware(HttpResponse)
+            with open(metrics.worker_file()) as file:
+                self.assertEqual(
+                    json.load(file), metrics.registry.snapshot()
+                )
+
+
+PROFILER_DIR = tempfile.mkdtemp()
+
+
+def slow_get(*args, **kwargs):
+    time.sleep(0.1)
+    return HttpResponse()
+
+
+@override_settings(
+    PROFILER_ENABLED=True, PROFILER_DIR=PROFILER_DIR, PROFILER_SLOW_MS=None
+)
+class ProfilerTests(TestCase):
+    """Test sampled and slow requests are profiled."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PROFILER_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(PROFILER_DIR, ignore_errors=True)
+
+    @override_settings(PROFILER_SAMPLE_RATE=1)
+    def test_sampled_request(self):
+        """Test sampled request is saved with cProfile stats and SQL."""
+        self.client.get(reverse('posts:index')).getvalue()
+        (meta,) = profiler.load_all()
+        self.assertEqual(meta['view'], 'posts:index')
+        self.assertEqual(meta['mode'], profiler.CPROFILE)
+        self.assertTrue(meta['queries'])
+        out = StringIO()
+        call_command('profiles', meta['id'], stdout=out)
+        self.assertIn('Functions by cumulative time', out.getvalue())
+        self.assertIn('SELECT', out.getvalue())
+
+    @override_settings(PROFILER_SAMPLE_RATE=1, STREAMING_PAGES=True)
+    def test_streamed_request(self):
+        """Test profile of streamed page is saved with its chunks."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+            self.assertEqual(profiler.load_all(), [])
+            response.getvalue()
+        (meta,) = profiler.load_all()
+        self.assertEqual(len(meta['queries']), len(queries))
+
+    @override_settings(PROFILER_SAMPLE_RATE=0, PROFILER_SLOW_MS=50)
+    def test_slow_request(self):
+        """Test only request over threshold is kept, with its stacks."""
+        self.client.get(reverse('about:author'))
+        self.assertEqual(profiler.load_all(), [])
+        with mock.patch(
+            'about.views.AboutAuthorView.get', side_effect=slow_get
+        ):
+            self.client.get(reverse('about:author'))
+        (meta,) = profiler.load_all()
+        self.assertEqual(meta['mode'], profiler.SAMPLER)
+        self.assertGreaterEqual(meta['elapsed_ms'], 50)
+        self.assertTrue(any(
+            stack.endswith(')') and 'slow_get' in stack
+            for stack in meta['stacks']
+        ))
+        out = StringIO()
+        call_command('profiles', stdout=out)
+        self.assertIn('about:author', out.getvalue())
+
+    @override_settings(PROFILER_SAMPLE_RATE=1, PROFILER_KEEP=2)
+    def test_old_profiles_are_pruned(self):
+        """Test only PROFILER_KEEP newest profiles stay on disk."""
+        for _ in range(3):
+            self.client.get(reverse('posts:index')).getvalue()
+        self.assertEqual(len(profiler.load_all()), 2)
+        self.assertEqual(
+            len([n for n in os.listdir(PROFILER_DIR) if n.endswith('.prof')]),
+            2,
+        )
+
+
+class SettingsProfilesTests(SimpleTestCase):
+    """Test production settings drop development overhead."""
+
+    def test_prod_settings(self):
+        """Test prod profile has no debug and caches templates."""
+        with mock.patch.dict(os.environ, {'YATUBE_SECRET_KEY': 'secret'}):
+            prod = importlib.import_module('yatube.settings.prod')
+        self.assertFalse(prod.DEBUG)
+        self.assertEqual(prod.SECRET_KEY, 'secret')
+        self.assertNotIn('debug_toolbar', prod.INSTALLED_APPS)
+        self.assertFalse(any('debug_toolbar' in name for name in prod.MIDDLEWARE))
+        options = prod.TEMPLATES[0]['OPTIONS']
+        self.assertEqual(
+            options['loaders'][0][0], 'django.template.loaders.cached.Loader'
+        )
+        self.assertGreater(prod.DATABASES['default']['CONN_MAX_AGE'], 0)
+        self.assertEqual(
+            prod.SESSION_ENGINE,
+            'django.contrib.sessions.backends.signed_cookies',
+        )
+        self.assertIn(
+            'django.template.context_processors.debug',
+            settings.TEMPLATES[0]['OPTIONS']['context_processors'],
+        )
@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import metrics as worker_metrics
 
 
 def page_not_found(request, exception):
@@ -19,3 +24,20 @@ def csrf_failure(request, reason=''):
 def server_error(request):
     """Page 500."""
     return render(request, 'core/500.html', status=500)
+
+
+def metrics(request):
+    """Prometheus metrics summed over workers, for METRICS_TOKEN only.
+
+    Client address is not checked, behind a local proxy every request
+    comes from it.
+    """
+    token = settings.METRICS_TOKEN
+    if not token or not constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'
+    ):
+        raise Http404
+    return HttpResponse(
+        worker_metrics.exposition(worker_metrics.collect()),
+        content_type=worker_metrics.CONTENT_TYPE,
+    )
@@ -1,10 +1,23 @@
 from django.contrib import admin
 
+from . import search
 from .models import Post, Group, Comment, Follow
 
 
-class PostAdmin(admin.ModelAdmin):
+class SearchIndexMixin:
+    """Admin search through full-text index instead of LIKE scans."""
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        ids = search.object_ids(search_term, self.search_kind)
+        return queryset.filter(pk__in=ids), False
+
+
+class PostAdmin(SearchIndexMixin, admin.ModelAdmin):
     """Custom admin model for posts."""
+    search_kind = search.POST
     list_display = (
         'pk',
         'text',
@@ -29,8 +42,9 @@ class GroupAdmin(admin.ModelAdmin):
     search_fields = ('title',)
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(SearchIndexMixin, admin.ModelAdmin):
     """Custom admin model for comments."""
+    search_kind = search.COMMENT
     list_display = (
         'post',
         'author',
@@ -0,0 +1,155 @@
+from functools import wraps
+
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_safe
+
+from .cache import (
+    conditional_feed, group_scope, index_scope, post_scope, profile_scope,
+    timeline_scope,
+)
+from .models import Comment, Group, Post, User
+from .utils import comment_pages, pages
+
+POST_FIELDS = ('id', 'text', 'pub_date', 'image')
+FEED_KEYS = ('pub_date', 'id')
+
+
+def post_rows(queryset, *fields):
+    """Plain dict rows of posts, no model instances."""
+    return queryset.values(
+        *POST_FIELDS,
+        *fields,
+        author_username=F('author__username'),
+        group_slug=F('group__slug'),
+    )
+
+
+def post_data(row):
+    """JSON-ready post from values() row."""
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author_username'],
+        'group': row['group_slug'],
+        'image': default_storage.url(row['image']) if row['image'] else None,
+    }
+
+
+def page_data(page):
+    return {
+        'results': [post_data(row) for row in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def comments_data(post_id, request):
+    """Batch of post comments with cursor of the next one."""
+    comments = comment_pages(post_id, request, Comment.objects.values(
+        'id', 'text', 'pub_date', author_username=F('author__username')
+    ))
+    return {
+        'comments': list(comments),
+        'next': comments.next_cursor,
+    }
+
+
+def api_login_required(view):
+    """Answer 401 instead of redirect to login form."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'detail': 'Authentication required.'}, status=401
+            )
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+@require_safe
+@conditional_feed(index_scope)
+def index(request):
+    """Main feed."""
+    page = pages(post_rows(Post.objects.all()), request, FEED_KEYS)
+    return JsonResponse(page_data(page))
+
+
+@require_safe
+@conditional_feed(group_scope)
+def group_posts(request, slug):
+    """Group with its feed."""
+    group = Group.objects.filter(slug=slug).values(
+        'id', 'title', 'slug', 'description', 'posts_count'
+    ).first()
+    if group is None:
+        raise Http404
+    page = pages(
+        post_rows(Post.objects.filter(group_id=group.pop('id'))),
+        request, FEED_KEYS,
+    )
+    return JsonResponse({'group': group, **page_data(page)})
+
+
+@require_safe
+@conditional_feed(profile_scope)
+def profile(request, username):
+    """Author with counters and feed."""
+    author = User.objects.filter(username=username).values(
+        'id', 'username', 'first_name', 'last_name',
+        posts_count=F('counters__posts_count'),
+        followers_count=F('counters__followers_count'),
+        following_count=F('counters__following_count'),
+    ).first()
+    if author is None:
+        raise Http404
+    page = pages(
+        post_rows(Post.objects.filter(author_id=author.pop('id'))),
+        request, FEED_KEYS,
+    )
+    return JsonResponse({'author': author, **page_data(page)})
+
+
+@require_safe
+@api_login_required
+@conditional_feed(timeline_scope)
+def follow_index(request):
+    """Feed of followed authors."""
+    rows = post_rows(
+        Post.objects.filter(timeline__user=request.user).annotate(
+            feed_date=F('timeline__pub_date'),
+            feed_id=F('timeline__id'),
+        ),
+        'feed_date', 'feed_id',
+    )
+    page = pages(rows, request, ('feed_date', 'feed_id'))
+    return JsonResponse(page_data(page))
+
+
+@require_safe
+@conditional_feed(post_scope)
+def post_detail(request, post_id):
+    """Post with first batch of comments."""
+    row = post_rows(
+        Post.objects.filter(pk=post_id), 'comments_count'
+    ).first()
+    if row is None:
+        raise Http404
+    return JsonResponse({
+        'post': {
+            **post_data(row),
+            'comments_count': row['comments_count'],
+        },
+        **comments_data(post_id, request),
+    })
+
+
+@require_safe
+@conditional_feed(post_scope)
+def post_comments(request, post_id):
+    """Next batch of post comments."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return JsonResponse(comments_data(post_id, request))
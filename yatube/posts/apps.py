@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     """App registration."""
     name: str = 'posts'
+
+    def ready(self):
+        """Connect signal handlers."""
+        from . import signals  # noqa: F401
@@ -0,0 +1,290 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from . import edge
+from .models import Follow, Group, Post, User
+from .utils import CURSOR_PARAM
+
+GENERATION_KEY = 'generation:{}'
+PAGE_KEY = 'feed_page:{}'
+
+
+def generation_timeout():
+    """Generations outlive pages built on them, then expire.
+
+    An expired generation just starts anew, so scopes of missing pages
+    and of deleted objects do not stay in cache forever.
+    """
+    return settings.FEED_CACHE_TIMEOUT * 2
+
+
+def index_scope(request, *args, **kwargs):
+    return ['index']
+
+
+def group_scope(request, slug):
+    return [f'group:{slug}']
+
+
+def profile_scope(request, username):
+    return [f'author:{username}']
+
+
+def timeline_scope(request):
+    return [f'timeline:{request.user.pk}']
+
+
+def post_scope(request, post_id):
+    return [f'post:{post_id}']
+
+
+def detail_scope(request, post_id):
+    """Post page also shows author counters."""
+    authors = Post.objects.filter(
+        pk=post_id
+    ).order_by().values_list('author__username', flat=True)
+    return [
+        f'post:{post_id}',
+        *(f'author:{username}' for username in authors),
+    ]
+
+
+def generation_key(scope):
+    """Memcached-safe key of scope generation."""
+    return GENERATION_KEY.format(hashlib.md5(scope.encode()).hexdigest())
+
+
+def generations(scopes):
+    """Get generation of every scope, start missing ones now."""
+    keys = [generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    for key, value in missing.items():
+        if not cache.add(key, value, generation_timeout()):
+            value = cache.get(key, value)
+        found[key] = value
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """Start new generation of scopes, dropping pages built on them.
+
+    Edge copies of these pages are purged too.
+    """
+    now = time.time_ns()
+    cache.set_many(
+        {generation_key(scope): now for scope in scopes},
+        generation_timeout(),
+    )
+    edge.purge(*scopes)
+
+
+def author_scopes(*user_ids):
+    return [
+        f'author:{username}' for username in User.objects.filter(
+            pk__in=user_ids
+        ).values_list('username', flat=True)
+    ]
+
+
+def post_scopes(post, group_ids=()):
+    """Scopes of every cached page that shows the post."""
+    group_ids = {post.group_id, *group_ids} - {None}
+    slugs = Group.objects.filter(
+        pk__in=group_ids
+    ).values_list('slug', flat=True)
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    return [
+        'index',
+        f'post:{post.pk}',
+        *author_scopes(post.author_id),
+        *(f'group:{slug}' for slug in slugs),
+        *(f'timeline:{user_id}' for user_id in followers),
+    ]
+
+
+def posts_scopes(posts):
+    """Scopes of every cached page that shows one of posts."""
+    rows = list(posts.order_by().values_list(
+        'pk', 'author_id', 'group__slug'
+    ))
+    author_ids = {author_id for _, author_id, _ in rows}
+    followers = Follow.objects.filter(
+        author_id__in=author_ids
+    ).values_list('user_id', flat=True).distinct()
+    return [
+        'index',
+        *(f'post:{pk}' for pk, _, _ in rows),
+        *author_scopes(*author_ids),
+        *{f'group:{slug}' for _, _, slug in rows if slug},
+        *(f'timeline:{user_id}' for user_id in followers),
+    ]
+
+
+def follow_scopes(follow):
+    return [
+        f'timeline:{follow.user_id}',
+        *author_scopes(follow.user_id, follow.author_id),
+    ]
+
+
+def request_scopes(request, scopes, *args, **kwargs):
+    """Scopes of requested page, computed once per request."""
+    found = request.__dict__.setdefault('_scopes', {})
+    if scopes not in found:
+        found[scopes] = scopes(request, *args, **kwargs)
+    return found[scopes]
+
+
+def request_generations(request, scopes):
+    """Generations of scopes, fetched once per request."""
+    fetched = request.__dict__.setdefault('_generations', {})
+    key = tuple(scopes)
+    if key not in fetched:
+        fetched[key] = generations(scopes)
+    return fetched[key]
+
+
+def fingerprint(request, scopes):
+    """Hash of page address, viewer and generations of its scopes."""
+    raw = '|'.join([
+        request.get_full_path(),
+        str(request.user.pk or 0),
+        *map(str, request_generations(request, scopes)),
+    ])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def page_key(request, scopes):
+    """Key of page by path, cursor, viewer and generations of scopes."""
+    raw = '|'.join([
+        request.path,
+        request.GET.get(CURSOR_PARAM, ''),
+        str(request.user.pk or 0),
+        *map(str, request_generations(request, scopes)),
+    ])
+    return PAGE_KEY.format(hashlib.md5(raw.encode()).hexdigest())
+
+
+def cache_stream(key, response):
+    """Pass streamed page through, cache it once fully sent.
+
+    Cached copy is a plain HttpResponse with headers set by the view.
+    """
+    page = HttpResponse(status=response.status_code)
+    for header, value in response.items():
+        page[header] = value
+    chunks = response.streaming_content
+
+    def tee():
+        content = []
+        for chunk in chunks:
+            content.append(chunk)
+            yield chunk
+        page.content = content
+        cache.set(key, page, settings.FEED_CACHE_TIMEOUT)
+    return tee()
+
+
+def cache_feed(scopes):
+    """Cache view response until a generation of its scopes changes.
+
+    Key includes viewer id, so no page is shared between users. Feeds
+    read only the cursor, requests with other query parameters are not
+    cached, so junk variants of a page cannot fill the cache.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ('GET', 'HEAD')
+                or not set(request.GET) <= {CURSOR_PARAM}
+            ):
+                return view(request, *args, **kwargs)
+            key = page_key(request, scopes(request, *args, **kwargs))
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.cookies:
+                    return response
+                if response.streaming:
+                    response.streaming_content = cache_stream(key, response)
+                else:
+                    cache.set(key, response, settings.FEED_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_feed(scopes, form=False):
+    """Answer 304 to polls while generations of scopes stay the same.
+
+    ETag and Last-Modified come from the cache only, so a matching
+    request never reaches the database. With form, the page shows a
+    form to signed-in users: their ETag follows the CSRF token and
+    there is no Last-Modified, so a new token brings a fresh page.
+    """
+    def with_form(request):
+        return form and request.user.is_authenticated
+
+    def etag(request, *args, **kwargs):
+        tag = fingerprint(
+            request, request_scopes(request, scopes, *args, **kwargs)
+        )
+        if with_form(request):
+            token = request.META.get('CSRF_COOKIE', '')
+            tag = hashlib.md5(f'{tag}|{token}'.encode()).hexdigest()
+        return tag
+
+    def last_modified(request, *args, **kwargs):
+        if with_form(request):
+            return None
+        current = request_generations(
+            request, request_scopes(request, scopes, *args, **kwargs)
+        )
+        return datetime.fromtimestamp(max(current) / 10 ** 9, timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def edge_cache(scopes):
+    """Let caching proxy share anonymous pages, tagged by their scopes.
+
+    Pages of logged in users stay private. Browsers always revalidate,
+    the proxy keeps page for EDGE_CACHE_SECONDS or until purged.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            patch_vary_headers(response, ['Cookie'])
+            if (
+                request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated
+                or response.cookies
+                or response.status_code not in (200, 304)
+            ):
+                patch_cache_control(response, private=True)
+                return response
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=0,
+                s_maxage=settings.EDGE_CACHE_SECONDS,
+            )
+            response[edge.SURROGATE_KEY] = edge.surrogate_keys(
+                request_scopes(request, scopes, *args, **kwargs)
+            )
+            return response
+        return wrapper
+    return decorator
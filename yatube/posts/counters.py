@@ -0,0 +1,52 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+def change(queryset, field, delta):
+    """Atomically shift counter field of queryset rows."""
+    value = F(field) + delta
+    if delta < 0:
+        value = Greatest(value, 0)
+    queryset.update(**{field: value})
+
+
+def change_user(user_id, field, delta):
+    """Shift user counter. Missing rows are fixed by reconcile()."""
+    change(UserCounters.objects.filter(user_id=user_id), field, delta)
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        change(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def _count(queryset, field, outer='pk'):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef(outer)})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def reconcile():
+    """Recompute all counters from source rows."""
+    UserCounters.objects.bulk_create(
+        (
+            UserCounters(user_id=pk)
+            for pk in User.objects.filter(
+                counters__isnull=True
+            ).values_list('pk', flat=True)
+        ),
+        ignore_conflicts=True,
+    )
+    UserCounters.objects.update(
+        posts_count=_count(Post.objects, 'author', 'user'),
+        followers_count=_count(Follow.objects, 'author', 'user'),
+        following_count=_count(Follow.objects, 'user', 'user'),
+    )
+    Group.objects.update(posts_count=_count(Post.objects, 'group'))
+    Post.objects.update(comments_count=_count(Comment.objects, 'post'))
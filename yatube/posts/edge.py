@@ -0,0 +1,85 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.db import transaction
+
+SURROGATE_KEY = 'Surrogate-Key'
+# Only anonymous pages reach the edge, timelines never do
+EDGE_SCOPES = ('index', 'post:', 'author:', 'group:')
+
+logger = logging.getLogger(__name__)
+_executor = None
+
+
+def executor():
+    """Single worker, so purges reach the proxy in commit order."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='edge-purge'
+        )
+    return _executor
+
+
+def edge_scopes(scopes):
+    return [scope for scope in scopes if scope.startswith(EDGE_SCOPES)]
+
+
+def surrogate_keys(scopes):
+    """Header-safe keys of scopes, e.g. post:1 or author:leo."""
+    return ' '.join(quote(scope, safe=':') for scope in scopes)
+
+
+def batches(scopes, limit):
+    """Surrogate-Key values of scopes, none longer than limit."""
+    batch = []
+    size = 0
+    for key in surrogate_keys(scopes).split():
+        if batch and size + 1 + len(key) > limit:
+            yield ' '.join(batch)
+            batch, size = [], 0
+        size += len(key) + (1 if batch else 0)
+        batch.append(key)
+    if batch:
+        yield ' '.join(batch)
+
+
+def send_purge(keys):
+    request = Request(
+        settings.EDGE_PURGE_URL,
+        method=settings.EDGE_PURGE_METHOD,
+        headers={SURROGATE_KEY: keys},
+    )
+    try:
+        with urlopen(request, timeout=settings.EDGE_PURGE_TIMEOUT):
+            pass
+    except (URLError, OSError):
+        logger.exception('Edge purge of %s failed', keys)
+
+
+def send_purges(values):
+    for keys in values:
+        send_purge(keys)
+
+
+def purge(*scopes):
+    """Drop edge copies of pages tagged by scopes once data is saved.
+
+    Requests go to the proxy from a worker thread, one per batch of
+    keys that fits EDGE_PURGE_MAX_HEADER.
+    """
+    scopes = edge_scopes(scopes)
+    if not settings.EDGE_PURGE_URL or not scopes:
+        return
+    values = list(batches(scopes, settings.EDGE_PURGE_MAX_HEADER))
+
+    def send():
+        if settings.EDGE_PURGE_ASYNC:
+            executor().submit(send_purges, values)
+        else:
+            send_purges(values)
+    transaction.on_commit(send)
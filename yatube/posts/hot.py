@@ -0,0 +1,95 @@
+import uuid
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Post, PostScore
+
+SNAPSHOT_KEY = 'hot_snapshot:{}'
+CURRENT_SNAPSHOT_KEY = 'hot_snapshot'
+
+
+def add_post(post):
+    PostScore.objects.get_or_create(
+        post=post, defaults={'score': settings.HOT_POST_WEIGHT}
+    )
+
+
+def on_comment(post_id):
+    PostScore.objects.filter(post_id=post_id).update(
+        score=F('score') + settings.HOT_COMMENT_WEIGHT
+    )
+
+
+def on_follow(author_id):
+    """New follower warms up recent posts of the author."""
+    since = timezone.now() - timedelta(days=settings.HOT_FOLLOW_WINDOW_DAYS)
+    PostScore.objects.filter(
+        post__author_id=author_id,
+        post__pub_date__gte=since,
+    ).update(score=F('score') + settings.HOT_FOLLOW_WEIGHT)
+
+
+def decay(hours):
+    """Apply exponential time decay for the hours passed."""
+    factor = 0.5 ** (hours / settings.HOT_HALF_LIFE_HOURS)
+    PostScore.objects.filter(score__gt=0).update(score=F('score') * factor)
+    PostScore.objects.filter(
+        score__gt=0, score__lt=settings.HOT_MIN_SCORE
+    ).update(score=0)
+
+
+def ranking(limit):
+    """Ids of hot posts, hottest first."""
+    return list(PostScore.objects.filter(score__gt=0).order_by(
+        '-score', '-post_id'
+    ).values_list('post_id', flat=True)[:limit])
+
+
+def snapshot(token=None):
+    """Token and post ids of a frozen hot ranking.
+
+    Scores keep changing, so pages of one reader come from the snapshot
+    named in the cursor and posts do not move across page boundaries.
+    Without a token, or when it expired, the current snapshot is used.
+    """
+    if token is not None:
+        ids = cache.get(SNAPSHOT_KEY.format(token))
+        if ids is not None:
+            return token, ids
+    token = cache.get(CURRENT_SNAPSHOT_KEY)
+    ids = None if token is None else cache.get(SNAPSHOT_KEY.format(token))
+    if ids is None:
+        token = uuid.uuid4().hex
+        ids = ranking(settings.HOT_SNAPSHOT_SIZE)
+        cache.set(
+            SNAPSHOT_KEY.format(token), ids, settings.HOT_SNAPSHOT_TIMEOUT
+        )
+        cache.set(
+            CURRENT_SNAPSHOT_KEY, token, settings.HOT_SNAPSHOT_SECONDS
+        )
+    return token, ids
+
+
+def rebuild(batch_size=1000):
+    """Start scores over from post comment counters."""
+    PostScore.objects.all().delete()
+    rows = Post.objects.values_list('pk', 'comments_count').iterator()
+    while True:
+        batch = [
+            PostScore(
+                post_id=pk,
+                score=(
+                    settings.HOT_POST_WEIGHT
+                    + settings.HOT_COMMENT_WEIGHT * comments_count
+                ),
+            )
+            for pk, comments_count in islice(rows, batch_size)
+        ]
+        if not batch:
+            break
+        PostScore.objects.bulk_create(batch)
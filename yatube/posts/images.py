@@ -0,0 +1,94 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps, ImageSequence
+
+KEEP_FORMATS = {
+    'JPEG': ('image/jpeg', '.jpg'),
+    'PNG': ('image/png', '.png'),
+    'WEBP': ('image/webp', '.webp'),
+    'GIF': ('image/gif', '.gif'),
+}
+DEFAULT_FORMAT = 'JPEG'
+# Formats that keep their animation, frames of others are dropped
+ANIMATED_FORMATS = ('GIF', 'PNG', 'WEBP')
+
+
+def animation(image, max_side):
+    """Frames of animated image scaled down, with save() options.
+
+    Frames are copied without metadata, only timing is kept.
+    """
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get('duration', 100))
+        frame = frame.convert('RGBA')
+        frame.info = {}
+        frame.thumbnail((max_side, max_side), Image.LANCZOS)
+        frames.append(frame)
+    options = {
+        'save_all': True,
+        'append_images': frames[1:],
+        'duration': durations,
+        'loop': image.info.get('loop', 0),
+    }
+    if image.format == 'GIF':
+        # Frames are whole pictures, not patches over previous ones
+        options['disposal'] = 2
+    return frames[0], options
+
+
+def normalize_upload(upload):
+    """Check and re-encode uploaded image.
+
+    Caps pixel size, drops EXIF and other metadata and writes result to
+    a temporary file on disk, never holding the whole image in memory.
+    Animated GIF, PNG and WebP are re-encoded frame by frame, up to
+    POST_IMAGE_MAX_FRAMES frames and POST_IMAGE_MAX_PIXELS in total.
+    """
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError('Файл картинки слишком большой.')
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except Image.DecompressionBombError:
+        raise ValidationError('Картинка слишком большая.')
+    width, height = image.size
+    frames = getattr(image, 'n_frames', 1)
+    animated = frames > 1 and image.format in ANIMATED_FORMATS
+    if animated and frames > settings.POST_IMAGE_MAX_FRAMES:
+        raise ValidationError('В анимации слишком много кадров.')
+    pixels = width * height * (frames if animated else 1)
+    if pixels > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError('Картинка слишком большая.')
+    source_format = image.format
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    options = {}
+    if animated:
+        image, options = animation(image, max_side)
+    else:
+        # JPEG decoder scales down by 1/2..1/8 while reading
+        image.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    output_format = (
+        source_format if source_format in KEEP_FORMATS else DEFAULT_FORMAT
+    )
+    if output_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    content_type, extension = KEEP_FORMATS[output_format]
+    name = os.path.splitext(os.path.basename(upload.name))[0] + extension
+    output = tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR)
+    image.save(
+        output,
+        output_format,
+        quality=settings.POST_IMAGE_UPLOAD_QUALITY,
+        optimize=output_format != 'GIF',
+        **options,
+    )
+    size = output.tell()
+    output.seek(0)
+    return UploadedFile(output, name, content_type, size)
@@ -0,0 +1,192 @@
+import json
+import math
+import os
+import platform
+import random
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post, User
+
+VIEWS = ('index', 'group_list', 'profile', 'follow_index', 'post_detail')
+SAMPLE_SIZE = 1000
+MEMORY_REQUESTS = 20
+BENCHMARK_ADDR = '192.0.2.1'
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return None
+    rank = math.ceil(percent / 100 * len(values))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+def sample(queryset, field):
+    return list(queryset.order_by('?').values_list(field, flat=True)[
+        :SAMPLE_SIZE
+    ])
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure latency percentiles, queries and memory per request '
+        'of feed views on current data. Seed it with seed_data first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--views', nargs='+', choices=VIEWS,
+                            default=VIEWS)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Measured requests per view.')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--cold', action='store_true',
+                            help='Clear cache before every request.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write JSON report to file.')
+
+    def urls(self, view):
+        """Random urls of view pointing to existing objects."""
+        if view in ('index', 'follow_index'):
+            return [reverse(f'posts:{view}')]
+        if view == 'group_list':
+            return [
+                reverse('posts:group_list', args=[slug])
+                for slug in sample(Group.objects, 'slug')
+            ]
+        if view == 'profile':
+            return [
+                reverse('posts:profile', args=[username])
+                for username in sample(
+                    User.objects.filter(posts__isnull=False).distinct(),
+                    'username',
+                )
+            ]
+        return [
+            reverse('posts:post_detail', args=[pk])
+            for pk in sample(Post.objects, 'pk')
+        ]
+
+    def client(self, view):
+        # Address outside INTERNAL_IPS keeps debug toolbar out of timings.
+        client = Client(REMOTE_ADDR=BENCHMARK_ADDR)
+        if view == 'follow_index':
+            follow = Follow.objects.order_by('?').first()
+            if follow is None:
+                raise CommandError('No follows, run seed_data first.')
+            client.force_login(follow.user)
+        return client
+
+    def request(self, client, url, cold):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                content = iter(response.streaming_content)
+                next(content, None)
+                first_byte = time.perf_counter() - started
+                for _ in content:
+                    pass
+            else:
+                first_byte = time.perf_counter() - started
+            elapsed = time.perf_counter() - started
+        return elapsed, first_byte, len(queries), response.status_code
+
+    def measure(self, view, rng, options):
+        urls = self.urls(view)
+        if not urls:
+            raise CommandError(f'No data for {view}, run seed_data first.')
+        client = self.client(view)
+        for _ in range(options['warmup']):
+            self.request(client, rng.choice(urls), options['cold'])
+        timings, first_bytes, queries, statuses = [], [], [], {}
+        for _ in range(options['requests']):
+            elapsed, first_byte, count, status = self.request(
+                client, rng.choice(urls), options['cold']
+            )
+            timings.append(elapsed * 1000)
+            first_bytes.append(first_byte * 1000)
+            queries.append(count)
+            statuses[status] = statuses.get(status, 0) + 1
+
+        tracemalloc.start()
+        for _ in range(min(MEMORY_REQUESTS, options['requests'])):
+            self.request(client, rng.choice(urls), options['cold'])
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        timings.sort()
+        first_bytes.sort()
+        return {
+            'requests': len(timings),
+            'status_codes': {str(code): n for code, n in statuses.items()},
+            'rps': round(len(timings) / (sum(timings) / 1000), 1),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p90_ms': round(percentile(timings, 90), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'max_ms': round(timings[-1], 3),
+            'ttfb_p50_ms': round(percentile(first_bytes, 50), 3),
+            'ttfb_p99_ms': round(percentile(first_bytes, 99), 3),
+            'queries_mean': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be positive.')
+        rng = random.Random(options['seed'])
+        report = {
+            'started': timezone.now().isoformat(),
+            'environment': {
+                'settings': os.getenv('YATUBE_ENV', 'dev'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'cache': settings.CACHES['default']['BACKEND'],
+                'debug': settings.DEBUG,
+                'streaming': settings.STREAMING_PAGES,
+            },
+            'data': {
+                'users': User.objects.count(),
+                'groups': Group.objects.count(),
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+            'options': {
+                key: options[key]
+                for key in ('requests', 'warmup', 'cold', 'seed')
+            },
+            'views': {},
+        }
+        # Test client host is not in production ALLOWED_HOSTS
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        for view in options['views']:
+            with override_settings(ALLOWED_HOSTS=hosts):
+                report['views'][view] = self.measure(view, rng, options)
+            self.stderr.write(
+                '{}: p50 {p50_ms} ms, p99 {p99_ms} ms, first byte p50 '
+                '{ttfb_p50_ms} ms, {queries_mean} queries'.format(
+                    view, **report['views'][view]
+                )
+            )
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
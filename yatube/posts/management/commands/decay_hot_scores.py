@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import hot
+
+
+class Command(BaseCommand):
+    help = 'Decay hot feed scores. Run it every HOT_DECAY_HOURS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=settings.HOT_DECAY_HOURS,
+            help='Hours passed since previous run.',
+        )
+
+    def handle(self, *args, **options):
+        hot.decay(options['hours'])
+        self.stdout.write(self.style.SUCCESS('Hot scores decayed'))
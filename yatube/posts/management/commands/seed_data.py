@@ -0,0 +1,165 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from posts import counters, hot, search, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 1000
+PASSWORD = 'benchmark'
+
+
+@contextmanager
+def own_pub_dates(*models):
+    """Let bulk_create keep generated pub_date values."""
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def last_pk(model):
+    return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+def insert(model, objects):
+    """Bulk insert objects from iterator in batches."""
+    objects = iter(objects)
+    total = 0
+    while True:
+        batch = list(islice(objects, BATCH_SIZE))
+        if not batch:
+            return total
+        model.objects.bulk_create(batch)
+        total += len(batch)
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill database with fake users, groups, follows, posts and '
+        'comments for benchmarks.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10_000)
+        parser.add_argument(
+            '--users', type=int,
+            help='Defaults to one author per 20 posts.',
+        )
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Follows per user.')
+        parser.add_argument('--comments', type=float, default=2,
+                            help='Average comments per post.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='Spread pub dates over that many days.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--no-search', action='store_true',
+                            help='Skip building search index.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        fake = Faker('ru_RU')
+        fake.seed_instance(options['seed'])
+        users_count = options['users'] or max(options['posts'] // 20, 2)
+        now = timezone.now()
+        period = timedelta(days=options['days']).total_seconds()
+
+        def moment():
+            return now - timedelta(seconds=rng.uniform(0, period))
+
+        def comments_count():
+            if not options['comments']:
+                return 0
+            return round(rng.expovariate(1 / options['comments']))
+
+        with transaction.atomic(), own_pub_dates(Post, Comment, Follow):
+            last_user = last_pk(User)
+            password = make_password(PASSWORD)
+            insert(User, (
+                User(
+                    username=f'{fake.user_name()}{last_user + number}',
+                    first_name=fake.first_name(),
+                    last_name=fake.last_name(),
+                    password=password,
+                )
+                for number in range(users_count)
+            ))
+            user_ids = list(User.objects.filter(
+                pk__gt=last_user
+            ).values_list('pk', flat=True))
+
+            last_group = last_pk(Group)
+            insert(Group, (
+                Group(
+                    title=fake.sentence(nb_words=3)[:200],
+                    slug=f'bench-{last_group + number}',
+                    description=fake.paragraph(),
+                )
+                for number in range(options['groups'])
+            ))
+            group_ids = list(Group.objects.filter(
+                pk__gt=last_group
+            ).values_list('pk', flat=True))
+
+            follows = min(options['follows'], len(user_ids) - 1)
+            insert(Follow, (
+                Follow(user_id=user_id, author_id=author_id, pub_date=now)
+                for user_id in user_ids
+                for author_id in [
+                    pk for pk in rng.sample(user_ids, follows + 1)
+                    if pk != user_id
+                ][:follows]
+            ))
+
+            last_post = last_pk(Post)
+            insert(Post, (
+                Post(
+                    author_id=rng.choice(user_ids),
+                    group_id=(
+                        rng.choice(group_ids)
+                        if group_ids and rng.random() < 0.7 else None
+                    ),
+                    text=fake.paragraph(nb_sentences=rng.randint(1, 8)),
+                    pub_date=moment(),
+                )
+                for _ in range(options['posts'])
+            ))
+            post_ids = Post.objects.filter(
+                pk__gt=last_post
+            ).values_list('pk', 'pub_date')
+
+            comments = insert(Comment, (
+                Comment(
+                    post_id=post_id,
+                    author_id=rng.choice(user_ids),
+                    text=fake.sentence(),
+                    pub_date=pub_date + (now - pub_date) * rng.random(),
+                )
+                for post_id, pub_date in post_ids.iterator()
+                for _ in range(comments_count())
+            ))
+
+            counters.reconcile()
+            timeline.rebuild()
+            hot.rebuild()
+            if not options['no_search']:
+                search.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded users: {len(user_ids)}, groups: {len(group_ids)}, '
+            f'posts: {options["posts"]}, comments: {comments}. '
+            f'Password of every user: {PASSWORD}'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Build missing responsive variants of existing post images.'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').values_list('pk', flat=True)
+        rendered = sum(
+            thumbnails.generate(post_id) for post_id in posts.iterator()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Post images processed: {rendered}'
+        ))
@@ -0,0 +1,65 @@
+from django.db import migrations
+
+# SQL is frozen here, posts.search may change after this migration
+TABLE = 'posts_search_index'
+CREATE_SQL = {
+    'sqlite': [
+        f'CREATE VIRTUAL TABLE {TABLE} USING fts5('
+        'body, kind UNINDEXED, object_id UNINDEXED, post_id UNINDEXED, '
+        "tokenize='unicode61 remove_diacritics 2')",
+    ],
+    'postgresql': [
+        f'CREATE TABLE {TABLE} ('
+        'kind varchar(16) NOT NULL, object_id integer NOT NULL, '
+        'post_id integer NOT NULL, document tsvector NOT NULL, '
+        'PRIMARY KEY (kind, object_id))',
+        f'CREATE INDEX {TABLE}_document ON {TABLE} USING GIN (document)',
+    ],
+}
+INSERT_SQL = {
+    'sqlite': (
+        f'INSERT INTO {TABLE} (body, kind, object_id, post_id) '
+        'VALUES (%s, %s, %s, %s)'
+    ),
+    'postgresql': (
+        f'INSERT INTO {TABLE} (document, kind, object_id, post_id) '
+        "VALUES (to_tsvector('simple', %s), %s, %s, %s)"
+    ),
+}
+DROP_SQL = f'DROP TABLE IF EXISTS {TABLE}'
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in CREATE_SQL:
+        return
+    for sql in CREATE_SQL[vendor]:
+        schema_editor.execute(sql)
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    with schema_editor.connection.cursor() as cursor:
+        for post in Post.objects.all():
+            cursor.execute(
+                INSERT_SQL[vendor], [post.text, 'post', post.pk, post.pk]
+            )
+        for comment in Comment.objects.all():
+            cursor.execute(
+                INSERT_SQL[vendor],
+                [comment.text, 'comment', comment.pk, comment.post_id],
+            )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_SQL:
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
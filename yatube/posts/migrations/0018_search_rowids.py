@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# SQL and rowid scheme are frozen here, posts.search may change later
+TABLE = 'posts_search_index'
+KINDS = ('post', 'comment')
+INSERT_SQL = (
+    f'INSERT OR REPLACE INTO {TABLE} '
+    '(rowid, body, kind, object_id, post_id) '
+    'VALUES (%s, %s, %s, %s, %s)'
+)
+
+
+def rowid(kind, object_id):
+    return object_id * len(KINDS) + KINDS.index(kind)
+
+
+def reindex(apps, schema_editor):
+    """Move SQLite documents to stable rowids."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for pk, text in Post.objects.values_list('pk', 'text').iterator():
+            cursor.execute(
+                INSERT_SQL, [rowid('post', pk), text, 'post', pk, pk]
+            )
+        comments = Comment.objects.values_list('pk', 'post_id', 'text')
+        for pk, post_id, text in comments.iterator():
+            cursor.execute(
+                INSERT_SQL,
+                [rowid('comment', pk), text, 'comment', pk, post_id],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex, migrations.RunPython.noop),
+    ]
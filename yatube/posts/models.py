@@ -1,3 +1,5 @@
+import json
+
 from django.db import models
 from django.contrib.auth import get_user_model
 
@@ -15,6 +17,7 @@ class Group(models.Model):
         unique=True
     )
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['-title']
@@ -24,6 +27,14 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    """Post queryset."""
+
+    def feed(self):
+        """Posts with author and group fetched in the same query."""
+        return self.select_related('author', 'group')
+
+
 class Post(CreatedModel):
     """Post class."""
     text = models.TextField(
@@ -50,14 +61,39 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    image_variants = models.TextField(blank=True, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'
+            ),
+        ]
 
     def __str__(self):
         """Get post text."""
         return self.text[:15]
 
+    @property
+    def variants(self):
+        """Responsive image variants of current image or None."""
+        if not self.image or not self.image_variants:
+            return None
+        variants = json.loads(self.image_variants)
+        if variants['image'] != self.image.name:
+            return None
+        return variants
+
 
 class Comment(CreatedModel):
     post = models.ForeignKey(
@@ -77,6 +113,12 @@ class Comment(CreatedModel):
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Комментарий'
+        indexes = [
+            models.Index(
+                fields=['post', '-pub_date', '-id'],
+                name='comment_post_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -98,3 +140,71 @@ class Follow(CreatedModel):
         constraints = [models.UniqueConstraint(
             fields=['author', 'user'], name='unique_follow')
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='follow_user_author_idx'
+            ),
+        ]
+
+
+class UserCounters(models.Model):
+    """Denormalized user counters."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts_count}'
+
+
+class PostScore(models.Model):
+    """Engagement score of post for hot feed."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='hot'
+    )
+    score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score', '-post'], name='post_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score:.2f}'
+
+
+class TimelineEntry(models.Model):
+    """Materialized follow feed entry."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-id'],
+                name='timeline_user_date_idx'
+            ),
+        ]
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'post'], name='unique_timeline_entry')
+        ]
@@ -0,0 +1,185 @@
+import re
+
+from django.db import connection
+
+from .models import Comment, Post
+
+TABLE = 'posts_search_index'
+POST = 'post'
+COMMENT = 'comment'
+KINDS = (POST, COMMENT)
+TERM_RE = re.compile(r'"([^"]+)"|(\S+)')
+WORD_RE = re.compile(r'\w+')
+
+
+def parse_query(query):
+    """Split user query into (words, is_prefix) terms.
+
+    "a b" is a phrase, word* is a prefix, other words must all match.
+    """
+    terms = []
+    for phrase, word in TERM_RE.findall(query):
+        words = WORD_RE.findall(phrase or word)
+        if words:
+            terms.append((words, not phrase and word.endswith('*')))
+    return terms
+
+
+class SQLiteBackend:
+    """SQLite FTS5 index, ranked by bm25."""
+
+    create_sql = [
+        f'CREATE VIRTUAL TABLE {TABLE} USING fts5('
+        'body, kind UNINDEXED, object_id UNINDEXED, post_id UNINDEXED, '
+        "tokenize='unicode61 remove_diacritics 2')",
+    ]
+    drop_sql = [f'DROP TABLE IF EXISTS {TABLE}']
+
+    def match(self, terms):
+        parts = []
+        for words, prefix in terms:
+            part = '"{}"'.format(' '.join(words))
+            parts.append(f'{part} *' if prefix else part)
+        return ' '.join(parts)
+
+    def rowid(self, kind, object_id):
+        """Stable rowid of document, so writes need no table scan."""
+        return object_id * len(KINDS) + KINDS.index(kind)
+
+    def index(self, cursor, kind, object_id, post_id, body):
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {TABLE} '
+            '(rowid, body, kind, object_id, post_id) '
+            'VALUES (%s, %s, %s, %s, %s)',
+            [self.rowid(kind, object_id), body, kind, object_id, post_id],
+        )
+
+    def remove(self, cursor, kind, object_id):
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid = %s',
+            [self.rowid(kind, object_id)],
+        )
+
+    def search(self, cursor, terms, kind, limit):
+        sql = (
+            f'SELECT kind, object_id, post_id FROM {TABLE} '
+            f'WHERE {TABLE} MATCH %s'
+        )
+        params = [self.match(terms)]
+        if kind:
+            sql += ' AND kind = %s'
+            params.append(kind)
+        cursor.execute(sql + ' ORDER BY rank LIMIT %s', params + [limit])
+        return cursor.fetchall()
+
+
+class PostgresBackend:
+    """PostgreSQL tsvector index with GIN, ranked by ts_rank."""
+
+    create_sql = [
+        f'CREATE TABLE {TABLE} ('
+        'kind varchar(16) NOT NULL, object_id integer NOT NULL, '
+        'post_id integer NOT NULL, document tsvector NOT NULL, '
+        'PRIMARY KEY (kind, object_id))',
+        f'CREATE INDEX {TABLE}_document ON {TABLE} USING GIN (document)',
+    ]
+    drop_sql = [f'DROP TABLE IF EXISTS {TABLE}']
+
+    def match(self, terms):
+        parts = []
+        for words, prefix in terms:
+            if prefix:
+                words = words[:-1] + [words[-1] + ':*']
+            parts.append('({})'.format(' <-> '.join(words)))
+        return ' & '.join(parts)
+
+    def index(self, cursor, kind, object_id, post_id, body):
+        cursor.execute(
+            f'INSERT INTO {TABLE} (kind, object_id, post_id, document) '
+            "VALUES (%s, %s, %s, to_tsvector('simple', %s)) "
+            'ON CONFLICT (kind, object_id) DO UPDATE '
+            'SET post_id = EXCLUDED.post_id, document = EXCLUDED.document',
+            [kind, object_id, post_id, body],
+        )
+
+    def remove(self, cursor, kind, object_id):
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE kind = %s AND object_id = %s',
+            [kind, object_id],
+        )
+
+    def search(self, cursor, terms, kind, limit):
+        sql = (
+            f'SELECT kind, object_id, post_id FROM {TABLE}, '
+            "to_tsquery('simple', %s) query WHERE document @@ query"
+        )
+        params = [self.match(terms)]
+        if kind:
+            sql += ' AND kind = %s'
+            params.append(kind)
+        cursor.execute(
+            sql + ' ORDER BY ts_rank(document, query) DESC LIMIT %s',
+            params + [limit],
+        )
+        return cursor.fetchall()
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend(),
+    'postgresql': PostgresBackend(),
+}
+
+
+def backend(using=connection):
+    return BACKENDS.get(using.vendor)
+
+
+def index(kind, object_id, post_id, body):
+    """Add or replace document in search index."""
+    engine = backend()
+    if engine:
+        with connection.cursor() as cursor:
+            engine.index(cursor, kind, object_id, post_id, body)
+
+
+def remove(kind, object_id):
+    engine = backend()
+    if engine:
+        with connection.cursor() as cursor:
+            engine.remove(cursor, kind, object_id)
+
+
+def search(query, kind=None, limit=1000):
+    """Get ranked (kind, object_id, post_id) rows, best match first."""
+    engine = backend()
+    terms = parse_query(query)
+    if not terms or not engine:
+        return []
+    with connection.cursor() as cursor:
+        return engine.search(cursor, terms, kind, limit)
+
+
+def post_ids(query, limit=1000):
+    """Ranked ids of posts matching by own text or comments."""
+    ids = {}
+    for kind, object_id, post_id in search(query, limit=limit):
+        ids.setdefault(post_id, None)
+    return list(ids)
+
+
+def object_ids(query, kind, limit=1000):
+    return [row[1] for row in search(query, kind, limit)]
+
+
+def rebuild():
+    """Index every post and comment from scratch."""
+    engine = backend()
+    if not engine:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for pk, text in Post.objects.values_list('pk', 'text').iterator():
+            engine.index(cursor, POST, pk, pk, text)
+        comments = Comment.objects.values_list('pk', 'post_id', 'text')
+        for pk, post_id, text in comments.iterator():
+            engine.index(cursor, COMMENT, pk, post_id, text)
@@ -0,0 +1,161 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, counters, hot, search, timeline
+from .models import Comment, Follow, Group, Post, UserCounters
+
+# Fields of authors and groups shown on post cards
+USER_CARD_FIELDS = ('username', 'first_name', 'last_name')
+GROUP_CARD_FIELDS = ('slug', 'title')
+
+
+def card_fields(sender, instance, fields, update_fields):
+    """Stored card fields of instance, None if they are not saved."""
+    if not instance.pk or (
+        update_fields is not None and not set(update_fields) & set(fields)
+    ):
+        return None
+    return sender.objects.filter(
+        pk=instance.pk
+    ).values_list(*fields).first()
+
+
+def refresh_cards(posts, *scopes):
+    """New version of posts, cached cards and pages with them go."""
+    scopes = [*cache.posts_scopes(posts), *scopes]
+    posts.update(version=F('version') + 1)
+    cache.bump(*scopes)
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    """Remember stored names to find renamed authors."""
+    instance._old_card_fields = card_fields(
+        sender, instance, USER_CARD_FIELDS, update_fields
+    )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, **kwargs):
+    """Create counters row for new user, refresh cards of renamed one."""
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+    old = getattr(instance, '_old_card_fields', None)
+    if old and old != tuple(
+        getattr(instance, field) for field in USER_CARD_FIELDS
+    ):
+        refresh_cards(
+            Post.objects.filter(author=instance), f'author:{old[0]}'
+        )
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, update_fields=None, **kwargs):
+    """Remember stored slug and title to find renamed groups."""
+    instance._old_card_fields = card_fields(
+        sender, instance, GROUP_CARD_FIELDS, update_fields
+    )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    """Drop cached group page, refresh cards of renamed group."""
+    cache.bump(f'group:{instance.slug}')
+    old = getattr(instance, '_old_card_fields', None)
+    if old and old != tuple(
+        getattr(instance, field) for field in GROUP_CARD_FIELDS
+    ):
+        refresh_cards(
+            Post.objects.filter(group=instance), f'group:{old[0]}'
+        )
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, **kwargs):
+    """Bump version and remember stored group to track group change.
+
+    Version is bumped by the UPDATE itself, so concurrent saves do not
+    lose increments. Posts without a stored row yet and fixtures keep
+    their version.
+    """
+    instance._old_group_id = None
+    if raw or not instance.pk:
+        return
+    stored = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('group_id').first()
+    if stored is not None:
+        instance.version = F('version') + 1
+        instance._old_group_id, = stored
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    """Push new post to timelines, update counters and cached pages."""
+    if created:
+        timeline.push_post(instance)
+        hot.add_post(instance)
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        counters.change_group(instance.group_id, 1)
+    else:
+        instance.refresh_from_db(fields=['version'])
+        if instance._old_group_id != instance.group_id:
+            counters.change_group(instance._old_group_id, -1)
+            counters.change_group(instance.group_id, 1)
+    search.index(search.POST, instance.pk, instance.pk, instance.text)
+    cache.bump(*cache.post_scopes(instance, [instance._old_group_id]))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """Update counters and cached pages on post delete."""
+    counters.change_user(instance.author_id, 'posts_count', -1)
+    counters.change_group(instance.group_id, -1)
+    search.remove(search.POST, instance.pk)
+    cache.bump(*cache.post_scopes(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """Update post counter, hot score, search index and cached post."""
+    search.index(
+        search.COMMENT, instance.pk, instance.post_id, instance.text
+    )
+    if created:
+        counters.change(
+            Post.objects.filter(pk=instance.post_id), 'comments_count', 1
+        )
+        hot.on_comment(instance.post_id)
+    cache.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """Update post comments counter, search index and cached post."""
+    search.remove(search.COMMENT, instance.pk)
+    counters.change(
+        Post.objects.filter(pk=instance.post_id), 'comments_count', -1
+    )
+    cache.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    """Backfill timeline, update counters and hot scores on follow."""
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+        hot.on_follow(instance.author_id)
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+        cache.bump(*cache.follow_scopes(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """Prune timeline and update counters on unfollow."""
+    timeline.prune(instance.user_id, instance.author_id)
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+    cache.bump(*cache.follow_scopes(instance))
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.shortcuts import render as render_page
+from django.template import loader
+
+from core import metrics
+
+from .utils import StreamedPage
+
+# Stands for streamed items in the rendered page shell
+MARKER = '<!-- streamed -->'
+
+
+def split(html):
+    head, marker, tail = html.partition(MARKER)
+    if not marker:
+        raise ValueError('Page shell has no {% streamed %} block.')
+    return head, tail
+
+
+def render(request, template_name, context):
+    """render() that streams the StreamedPage of context.
+
+    Everything before its {% streamed %} block is rendered right away,
+    so <head> and header go out before the page items are read. Items
+    follow in chunks of STREAM_CHUNK_SIZE, then the {% after %} part
+    of the block, rendered once they are done and has_next is known.
+    The shell itself is rendered only once.
+    """
+    streamed = [
+        value for value in context.values()
+        if isinstance(value, StreamedPage)
+    ]
+    if not streamed:
+        return render_page(request, template_name, context)
+    page, = streamed
+    template = loader.get_template(template_name)
+    # Head is rendered inside the view, so middleware sees its CSRF
+    # cookie and session use.
+    head, tail = split(template.render(context, request))
+    return StreamingHttpResponse(stream(head, page, tail))
+
+
+def stream(head, page, tail):
+    yield head
+    nodelist, after, block_context = page.slot
+    for _ in page.chunks(settings.STREAM_CHUNK_SIZE):
+        with metrics.rendering():
+            chunk = nodelist.render(block_context)
+        yield chunk
+    with metrics.rendering():
+        chunk = after.render(block_context)
+    yield chunk + tail
@@ -0,0 +1,61 @@
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+CARD_TEMPLATE = 'includes/article.html'
+CARD_FRAGMENT = 'post_card'
+CARD_TIMEOUT = 86400
+SEPARATOR = '<hr>'
+
+
+def fragment_cache():
+    """Cache the {% cache %} tag would use for fragments."""
+    try:
+        return caches['template_fragments']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def card_key(post, author, group):
+    return make_template_fragment_key(CARD_FRAGMENT, [
+        post.pk,
+        post.version,
+        getattr(author, 'pk', ''),
+        getattr(group, 'slug', ''),
+    ])
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """<article> cards of posts for feed pages.
+
+    Cached cards of the whole page come from one get_many, only
+    missing ones are rendered from the compiled card template. Of a
+    streamed page, posts is the current chunk.
+    """
+    items = list(posts)
+    author, group = context.get('author'), context.get('group')
+    keys = [card_key(post, author, group) for post in items]
+    cache = fragment_cache()
+    cards = cache.get_many(keys)
+    missing = {}
+    card = None
+    for post, key in zip(items, keys):
+        if key in cards:
+            continue
+        if card is None:
+            card = context.template.engine.get_template(CARD_TEMPLATE)
+        with context.push(post=post):
+            missing[key] = cards[key] = card.render(context)
+    if missing:
+        cache.set_many(missing, CARD_TIMEOUT)
+    last = len(keys) - 1 if getattr(posts, 'last_chunk', True) else None
+    return mark_safe(''.join(
+        '<article>{}{}</article>'.format(
+            cards[key], SEPARATOR if number != last else ''
+        )
+        for number, key in enumerate(keys)
+    ))
@@ -0,0 +1,36 @@
+from django import template
+from django.core.files.storage import default_storage
+
+register = template.Library()
+
+FALLBACK_TYPE = 'image/jpeg'
+
+
+def srcset(items):
+    return ', '.join(
+        f'{default_storage.url(name)} {width}w' for width, name in items
+    )
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(post):
+    """Post <picture> from stored variants, original until they are ready.
+
+    Reads only variant metadata of the post row, no filesystem access.
+    """
+    variants = post.variants
+    if not variants:
+        return {'post': post}
+    fallback = variants['sources'][FALLBACK_TYPE]
+    return {
+        'post': post,
+        'sources': [
+            {'type': mime, 'srcset': srcset(items)}
+            for mime, items in variants['sources'].items()
+            if mime != FALLBACK_TYPE
+        ],
+        'src': default_storage.url(fallback[-1][1]),
+        'srcset': srcset(fallback),
+        'width': variants['width'],
+        'height': variants['height'],
+    }
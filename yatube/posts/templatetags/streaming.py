@@ -0,0 +1,45 @@
+from copy import copy
+
+from django import template
+
+from ..streaming import MARKER
+from ..utils import StreamedPage
+
+register = template.Library()
+
+
+class StreamedNode(template.Node):
+
+    def __init__(self, page, nodelist, after):
+        self.page = page
+        self.nodelist = nodelist
+        self.after = after
+
+    def render(self, context):
+        page = self.page.resolve(context)
+        if not isinstance(page, StreamedPage):
+            return self.nodelist.render(context) + self.after.render(context)
+        page.slot = (self.nodelist, self.after, copy(context))
+        return MARKER
+
+
+@register.tag
+def streamed(parser, token):
+    """Items of page, rendered chunk by chunk when page is streamed.
+
+    {% streamed page_obj %}...{% after %}...{% endstreamed %}
+    Content of the block is rendered once per chunk with object_list
+    of page holding that chunk. The optional {% after %} part is
+    rendered once all chunks are out, so it can use has_next.
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]} takes one argument, the page.'
+        )
+    nodelist = parser.parse(('after', 'endstreamed'))
+    after = template.NodeList()
+    if parser.next_token().contents == 'after':
+        after = parser.parse(('endstreamed',))
+        parser.delete_first_token()
+    return StreamedNode(parser.compile_filter(bits[1]), nodelist, after)
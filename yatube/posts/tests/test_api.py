@@ -0,0 +1,128 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+@override_settings(COUNT_PER_PAGE=2)
+class ApiTest(TestCase):
+    """Test read-only JSON API."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='writer')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(3)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds(self):
+        """Test every feed returns newest posts and next cursor."""
+        urls = {
+            reverse('posts:api_index'): self.client,
+            reverse('posts:api_group_list', args=['group']): self.client,
+            reverse('posts:api_profile', args=['writer']): self.client,
+            reverse('posts:api_follow_index'): self.reader_client,
+        }
+        for url, client in urls.items():
+            with self.subTest(url=url):
+                data = client.get(url).json()
+                self.assertEqual(
+                    [post['text'] for post in data['results']],
+                    ['Пост 2', 'Пост 1'],
+                )
+                self.assertEqual(data['results'][0]['author'], 'writer')
+                self.assertEqual(data['results'][0]['group'], 'group')
+                data = client.get(url, {'cursor': data['next']}).json()
+                self.assertEqual(
+                    [post['text'] for post in data['results']], ['Пост 0']
+                )
+                self.assertIsNone(data['next'])
+
+    def test_feed_headers(self):
+        """Test group and author info and counters."""
+        data = self.client.get(
+            reverse('posts:api_group_list', args=['group'])
+        ).json()
+        self.assertEqual(data['group']['posts_count'], 3)
+        data = self.client.get(
+            reverse('posts:api_profile', args=['writer'])
+        ).json()
+        self.assertEqual(data['author']['followers_count'], 1)
+
+    def test_post_detail(self):
+        """Test post with comments."""
+        post = self.posts[0]
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        data = self.client.get(
+            reverse('posts:api_post_detail', args=[post.pk])
+        ).json()
+        self.assertEqual(data['post']['comments_count'], 1)
+        self.assertEqual(data['comments'][0]['text'], 'Ответ')
+
+    def test_errors(self):
+        """Test unknown objects, anonymous timeline and writes."""
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:api_group_list', args=['missing'])
+            ).status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+        self.assertEqual(
+            self.client.get(reverse('posts:api_follow_index')).status_code,
+            HTTPStatus.UNAUTHORIZED,
+        )
+        self.assertEqual(
+            self.client.post(reverse('posts:api_index')).status_code,
+            HTTPStatus.METHOD_NOT_ALLOWED,
+        )
+
+    def test_not_modified(self):
+        """Test repeated poll gets 304 without touching the database."""
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_changes(self):
+        """Test new content changes ETag of affected responses only."""
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_post_detail', args=[self.posts[0].pk]),
+            reverse('posts:api_post_detail', args=[self.posts[1].pk]),
+        ]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Ответ'
+        )
+        changed = [
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+            for url, etag in zip(urls, etags)
+        ]
+        self.assertEqual(changed, [
+            HTTPStatus.NOT_MODIFIED, HTTPStatus.OK, HTTPStatus.NOT_MODIFIED,
+        ])
+        Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            self.client.get(urls[0], HTTP_IF_NONE_MATCH=etags[0]).status_code,
+            HTTPStatus.OK,
+        )
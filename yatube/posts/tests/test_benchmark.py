@@ -0,0 +1,78 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..management.commands.benchmark import VIEWS, percentile
+from ..models import Comment, Follow, Post, TimelineEntry, User
+
+
+class BenchmarkTest(TestCase):
+    """Test seeding and benchmark commands."""
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_data', posts=60, users=6, groups=2, follows=2,
+            stdout=StringIO(),
+        )
+
+    def test_seed_data(self):
+        """Test seeded data is consistent with denormalized tables."""
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(User.objects.count(), 6)
+        self.assertEqual(Follow.objects.count(), 12)
+        self.assertEqual(
+            TimelineEntry.objects.count(),
+            sum(
+                Post.objects.filter(author_id=author_id).count()
+                for author_id in Follow.objects.values_list(
+                    'author_id', flat=True
+                )
+            ),
+        )
+        post = Post.objects.order_by('?').first()
+        self.assertEqual(post.comments_count, post.comments.count())
+        self.assertEqual(post.hot.score, 1 + 3 * post.comments_count)
+        self.assertTrue(Comment.objects.exists())
+
+    def test_benchmark_report(self):
+        """Test report has stats of every view."""
+        out = StringIO()
+        call_command(
+            'benchmark', requests=3, warmup=1, stdout=out, stderr=StringIO()
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['data']['posts'], 60)
+        self.assertEqual(list(report['views']), list(VIEWS))
+        for view, stats in report['views'].items():
+            with self.subTest(view=view):
+                self.assertEqual(stats['status_codes'], {'200': 3})
+                self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+                self.assertLessEqual(stats['ttfb_p50_ms'], stats['p50_ms'])
+                self.assertGreater(stats['peak_memory_kb'], 0)
+
+    def test_benchmark_streamed(self):
+        """Test streamed pages are read to the end."""
+        reports = {}
+        for streaming in (False, True):
+            out = StringIO()
+            with self.settings(STREAMING_PAGES=streaming):
+                call_command(
+                    'benchmark', requests=3, warmup=1, cold=True,
+                    views=['post_detail'], stdout=out, stderr=StringIO(),
+                )
+            reports[streaming] = json.loads(out.getvalue())
+        self.assertTrue(reports[True]['environment']['streaming'])
+        self.assertEqual(
+            reports[True]['views']['post_detail']['queries_max'],
+            reports[False]['views']['post_detail']['queries_max'],
+        )
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 90), 7)
+        self.assertIsNone(percentile([], 50))
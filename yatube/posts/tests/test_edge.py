@@ -0,0 +1,125 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from django.core.cache import cache
+from django.test import Client, TestCase, TransactionTestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from .. import edge
+from ..models import Comment, Follow, Group, Post, User
+
+
+class PurgeHandler(BaseHTTPRequestHandler):
+    """Caching proxy stand-in, records purged keys."""
+    purged = []
+
+    def do_PURGE(self):
+        self.purged.append(self.headers['Surrogate-Key'])
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class EdgeHeadersTest(TestCase):
+    """Test shareable anonymous pages."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='writer')
+        Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.keys = {
+            reverse('posts:index'): 'index',
+            reverse('posts:group_list', args=['group']): 'group:group',
+            reverse('posts:profile', args=['writer']): 'author:writer',
+            reverse('posts:post_detail', args=[self.post.pk]):
+                f'post:{self.post.pk} author:writer',
+        }
+
+    def test_anonymous_pages_are_public(self):
+        """Test anonymous pages carry shared cache headers and keys."""
+        for url, keys in self.keys.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('s-maxage=300', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+                self.assertEqual(response['Surrogate-Key'], keys)
+
+    def test_user_pages_are_private(self):
+        """Test pages of logged in user are never shared."""
+        client = Client()
+        client.force_login(self.author)
+        for url in self.keys:
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertFalse(response.has_header('Surrogate-Key'))
+
+
+class EdgePurgeTest(TransactionTestCase):
+    """Test changes purge affected edge pages."""
+    def setUp(self):
+        PurgeHandler.purged = []
+        self.server = HTTPServer(('127.0.0.1', 0), PurgeHandler)
+        threading.Thread(target=self.server.serve_forever).start()
+        host, port = self.server.server_address
+        self.settings = override_settings(
+            EDGE_PURGE_URL=f'http://{host}:{port}/'
+        )
+        self.settings.enable()
+        self.author = User.objects.create(username='writer')
+        self.group = Group.objects.create(title='Группа', slug='group')
+
+    def tearDown(self):
+        self.settings.disable()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def wait(self):
+        """Let the purge worker send everything queued so far."""
+        edge.executor().submit(lambda: None).result()
+
+    def test_post_and_comment_purge(self):
+        """Test post and comment changes purge their edge pages only."""
+        reader = User.objects.create(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        self.wait()
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        self.wait()
+        self.assertEqual(PurgeHandler.purged[-1].split(), [
+            'index', f'post:{post.pk}', 'author:writer', 'group:group',
+        ])
+        Comment.objects.create(post=post, author=self.author, text='Да')
+        self.wait()
+        self.assertEqual(PurgeHandler.purged[-1], f'post:{post.pk}')
+
+    @override_settings(EDGE_PURGE_ASYNC=False, EDGE_PURGE_MAX_HEADER=20)
+    def test_long_key_lists_are_split(self):
+        """Test keys over header limit go in several purges."""
+        self.wait()
+        PurgeHandler.purged.clear()
+        edge.purge('index', 'post:1', 'post:2', 'group:a', 'timeline:1')
+        self.assertEqual(PurgeHandler.purged, [
+            'index post:1 post:2', 'group:a',
+        ])
+        self.assertTrue(all(
+            len(keys) <= 20 for keys in edge.batches(
+                [f'post:{number}' for number in range(100)], 20
+            )
+        ))
+
+    def test_unreachable_proxy_is_ignored(self):
+        """Test failed purge is logged and does not break saving."""
+        with override_settings(EDGE_PURGE_URL='http://127.0.0.1:9/'):
+            with self.assertLogs('posts.edge', 'ERROR'):
+                Post.objects.create(author=self.author, text='Пост')
+                self.wait()
+        self.assertEqual(Post.objects.count(), 1)
@@ -1,7 +1,10 @@
 from http import HTTPStatus
+from io import BytesIO
 import shutil
 import tempfile
 
+from PIL import Image
+
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -118,6 +121,109 @@ class PostFormTests(TestCase):
         self.assertEqual(post.group_id, form_data['group'])
         self.assertEqual(post.image, 'posts/new_small.gif')
 
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_uploaded_image_normalized(self):
+        """Test big photo is scaled down and stripped of EXIF."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        buffer = BytesIO()
+        Image.new('RGB', (400, 200), 'red').save(buffer, 'JPEG', exif=exif)
+        form_data = {
+            'text': 'Пост с фотографией',
+            'image': SimpleUploadedFile(
+                name='photo.jpeg',
+                content=buffer.getvalue(),
+                content_type='image/jpeg',
+            ),
+        }
+        self.authorized_user.post(
+            reverse('posts:post_create'),
+            data=form_data,
+        )
+        post = Post.objects.get(text=form_data['text'])
+        self.assertEqual(post.image.name, 'posts/photo.jpg')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_animated_image_normalized(self):
+        """Test animation keeps its frames, is scaled and stripped."""
+        exif = Image.Exif()
+        exif[0x8825] = {0x0001: 'N'}
+        frames = [
+            Image.new('RGB', (400, 200), color)
+            for color in ('red', 'green', 'blue')
+        ]
+        buffer = BytesIO()
+        frames[0].save(
+            buffer, 'WEBP', save_all=True, append_images=frames[1:],
+            duration=100, exif=exif,
+        )
+        self.authorized_user.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с анимацией',
+                'image': SimpleUploadedFile(
+                    name='clip.webp',
+                    content=buffer.getvalue(),
+                    content_type='image/webp',
+                ),
+            },
+        )
+        post = Post.objects.get(text='Пост с анимацией')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(image.n_frames, 3)
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(POST_IMAGE_MAX_FRAMES=2)
+    def test_too_long_animation_rejected(self):
+        """Test animation over frame limit is rejected."""
+        frames = [Image.new('P', (10, 10), color) for color in range(3)]
+        buffer = BytesIO()
+        frames[0].save(
+            buffer, 'GIF', save_all=True, append_images=frames[1:]
+        )
+        posts_count = Post.objects.count()
+        response = self.authorized_user.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Длинная анимация',
+                'image': SimpleUploadedFile(
+                    name='long.gif',
+                    content=buffer.getvalue(),
+                    content_type='image/gif',
+                ),
+            },
+        )
+        self.assertEqual(Post.objects.count(), posts_count)
+        self.assertFormError(
+            response, 'form', 'image', 'В анимации слишком много кадров.'
+        )
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_big_image_rejected(self):
+        """Test image over pixel limit is rejected."""
+        buffer = BytesIO()
+        Image.new('RGB', (20, 20)).save(buffer, 'PNG')
+        posts_count = Post.objects.count()
+        response = self.authorized_user.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Слишком большая картинка',
+                'image': SimpleUploadedFile(
+                    name='big.png',
+                    content=buffer.getvalue(),
+                    content_type='image/png',
+                ),
+            },
+        )
+        self.assertEqual(Post.objects.count(), posts_count)
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка слишком большая.'
+        )
+
     def test_created_comment_not_auth_user(self):
         """Test comment create not auth user."""
         comment_count = self.post.comments.count()
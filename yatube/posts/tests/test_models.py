@@ -1,6 +1,9 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post, User
+from ..models import Comment, Follow, Group, Post, User, UserCounters
 
 
 class PostModelTest(TestCase):
@@ -66,3 +69,77 @@ class GroupModelTest(TestCase):
         """Test model Group have correct object name."""
         group = GroupModelTest.group
         self.assertEqual(str(group), group.title)
+
+
+class CountersTest(TestCase):
+    """Denormalized counters testing."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='counters',
+            description='Описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_counters',
+            description='Описание',
+        )
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Test post create, group change and delete update counters."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Текст'
+        )
+        self.group.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_comment_counters(self):
+        """Test comments counter of post."""
+        post = Post.objects.create(author=self.author, text='Текст')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Test followers and followings counters."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_reconcile_counters_command(self):
+        """Test reconcile_counters fixes drift."""
+        Post.objects.bulk_create([
+            Post(author=self.author, group=self.group, text='Текст'),
+            Post(author=self.author, text='Текст'),
+        ])
+        UserCounters.objects.filter(user=self.reader).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 2)
+        self.assertEqual(self.counters(self.reader).posts_count, 0)
+        self.assertEqual(self.group.posts_count, 1)
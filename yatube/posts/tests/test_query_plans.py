@@ -0,0 +1,73 @@
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+BAD_PLAN = re.compile(
+    r'USE TEMP B-TREE|SCAN (TABLE )?(posts_|auth_user)\w*$'
+)
+
+
+class QueryPlanTest(TestCase):
+    """Test feed queries use indexes, no full scans or temp sorts."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='plan_author')
+        cls.reader = User.objects.create(username='plan_reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='plan_group',
+            description='Описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(settings.COUNT_PER_PAGE + 1):
+            post = Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text=f'Пост {number}',
+            )
+        Comment.objects.create(post=post, author=cls.reader, text='Текст')
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def bad_plans(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        bad = []
+        for query in queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                for row in cursor.fetchall():
+                    if BAD_PLAN.search(row[-1]):
+                        bad.append((row[-1], query['sql']))
+        return response, bad
+
+    def test_feed_query_plans(self):
+        """Test every page of every feed uses indexes."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:hot_index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'plan_author'}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response, bad = self.bad_plans(url)
+                self.assertEqual(bad, [])
+                page_obj = response.context.get('page_obj')
+                if page_obj is not None and page_obj.has_next():
+                    _, bad = self.bad_plans(url + '?' + page_obj.next_query)
+                    self.assertEqual(bad, [])
@@ -0,0 +1,166 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.signals import template_rendered
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from ..utils import CURSOR_PARAM, CursorPaginator, CursorPage, StreamedPage
+
+CSRF_TOKEN = re.compile(r'name="csrfmiddlewaretoken" value="[^"]+"')
+
+
+@override_settings(
+    STREAMING_PAGES=True, STREAM_CHUNK_SIZE=2,
+    COUNT_PER_PAGE=5, COMMENTS_PER_PAGE=5,
+)
+class StreamingTest(TestCase):
+    """Test streamed feed and post pages."""
+    maxDiff = None
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(7)
+        ]
+        cls.post = cls.posts[-1]
+        for number in range(7):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader,
+                text=f'Комментарий {number}',
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.author.username]),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', args=[cls.post.pk]),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def chunks(self, url):
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        return [chunk.decode() for chunk in response.streaming_content]
+
+    def test_same_html_as_rendered_page(self):
+        """Test streamed pages match pages rendered at once."""
+        for url in self.urls:
+            for query in ('', f'?{CURSOR_PARAM}='):
+                with self.subTest(url=url, query=query):
+                    streamed = ''.join(self.chunks(url))
+                    cache.clear()
+                    with self.settings(STREAMING_PAGES=False):
+                        response = self.client.get(url)
+                    cache.clear()
+                    self.assertFalse(response.streaming)
+                    self.assertHTMLEqual(
+                        CSRF_TOKEN.sub('', streamed),
+                        CSRF_TOKEN.sub('', response.content.decode()),
+                    )
+
+    def test_head_sent_before_items_are_read(self):
+        """Test head goes out first, items are read after it."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                content = iter(response.streaming_content)
+                with CaptureQueriesContext(connection) as queries:
+                    head = next(content).decode()
+                self.assertEqual(len(queries), 0)
+                self.assertIn('</header>', head)
+                self.assertNotIn('<article>', head)
+                self.assertNotIn('Комментарий', head)
+                with CaptureQueriesContext(connection) as queries:
+                    rest = b''.join(content).decode()
+                self.assertEqual(len(queries), 1)
+                self.assertIn('</footer>', rest)
+
+    def test_shell_is_rendered_once(self):
+        """Test page template is rendered once, tail comes from it."""
+        templates = {
+            'posts:index': 'posts/index.html',
+            'posts:group_list': 'posts/group_list.html',
+            'posts:profile': 'posts/profile.html',
+            'posts:follow_index': 'posts/follow.html',
+            'posts:post_detail': 'posts/post_detail.html',
+        }
+        rendered = []
+
+        def on_render(sender, template, **kwargs):
+            rendered.append(template.name)
+        template_rendered.connect(on_render)
+        self.addCleanup(template_rendered.disconnect, on_render)
+        for url in self.urls:
+            with self.subTest(url=url):
+                rendered.clear()
+                self.chunks(url)
+                name = templates[resolve(url).view_name]
+                self.assertEqual(rendered.count(name), 1)
+
+    def test_items_come_in_chunks(self):
+        """Test page of 5 posts comes in chunks of 2 with next link."""
+        head, *items, tail = self.chunks(reverse('posts:index'))
+        self.assertEqual(
+            [chunk.count('<article>') for chunk in items], [2, 2, 1]
+        )
+        self.assertEqual(''.join(items).count('<hr>'), 4)
+        self.assertIn(f'?{CURSOR_PARAM}=', tail)
+
+    def test_next_pages_follow_cursor(self):
+        """Test streamed next page continues after last streamed post."""
+        html = ''.join(self.chunks(reverse('posts:index')))
+        cursor = html.split(f'?{CURSOR_PARAM}=')[1].split('"')[0]
+        html = ''.join(self.chunks(
+            reverse('posts:index') + f'?{CURSOR_PARAM}={cursor}'
+        ))
+        self.assertIn('Пост 1<', html)
+        self.assertIn('Пост 0<', html)
+        self.assertNotIn('Пост 2<', html)
+
+    def test_streamed_feed_is_cached(self):
+        """Test fully streamed feed page is served from cache after."""
+        self.client = Client()
+        url = reverse('posts:group_list', args=[self.group.slug])
+        streamed = ''.join(self.chunks(url))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.content.decode(), streamed)
+        self.assertEqual(len(queries), 0)
+
+    def test_page_holds_one_chunk(self):
+        """Test streamed page keeps only current chunk in memory."""
+        paginator = CursorPaginator(Post.objects.all(), per_page=5)
+        page = paginator.get_page(stream=True)
+        self.assertIsInstance(page, StreamedPage)
+        chunks = [len(chunk) for chunk in page.chunks(2)]
+        self.assertEqual(chunks, [2, 2, 1])
+        self.assertEqual(len(page.object_list), 1)
+        expected = paginator.get_page()
+        self.assertIsInstance(expected, CursorPage)
+        self.assertTrue(page.has_next())
+        self.assertEqual(page.next_cursor, expected.next_cursor)
+        previous = paginator.get_page(page.next_cursor, stream=True)
+        list(previous.chunks(2))
+        self.assertFalse(previous.has_next())
+        self.assertTrue(previous.has_previous())
+        self.assertEqual(
+            paginator.get_page(previous.previous_cursor).object_list,
+            expected.object_list,
+        )
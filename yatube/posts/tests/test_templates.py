@@ -0,0 +1,170 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.template import engines
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from ..models import Group, Post, User
+from ..templatetags.post_cards import fragment_cache
+from ..utils import pages
+
+# Feed loop and card as they were before {% post_cards %}
+LEGACY_LOOP = """
+  {% for post in page_obj %}
+    {% include legacy_article %}
+  {% endfor %}
+"""
+LEGACY_ARTICLE = """{% load cache post_images %}
+<article>
+  {% cache 86400 legacy_card post.pk post.version author.pk group.slug %}
+  <ul>
+  {% if not author %}
+    <li>
+      <a href="{% url 'posts:profile' post.author %}">Автор: {{ post.author.get_full_name }}</a>
+    </li>
+  {% endif %}
+    <li>
+      Дата публикации: {{ post.pub_date|date:"d E Y" }}
+    </li>
+  </ul>
+  {% post_image post %}  
+  <p>{{ post.text|linebreaksbr }}</p>    
+  {% if not group.slug and post.group %}   
+    <a href="{% url 'posts:group_list' post.group.slug %}">{{ post.group.title }}</a>
+  {% endif %} 
+  <a href="{% url 'posts:post_detail' post.pk %}">Подробная информация</a>
+  {% endcache %}
+  {% if not forloop.last %}<hr>{% endif %}
+</article>
+"""  # noqa: W291
+VARIANTS = {
+    'sources': {
+        'image/webp': [[320, 'posts/variants/card-320.webp']],
+        'image/jpeg': [[320, 'posts/variants/card-320.jpg']],
+    },
+    'width': 320,
+    'height': 113,
+    'image': 'posts/card.jpg',
+}
+
+
+class PostCardsTest(TestCase):
+    """Test {% post_cards %} renders the same HTML as the include loop."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group if number % 2 else None,
+                text=f'Пост {number}\nвторая строка <b>',
+                image='posts/card.jpg' if number else '',
+                image_variants=json.dumps(VARIANTS) if number == 1 else '',
+            )
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.engine = engines['django']
+
+    def request(self, url):
+        request = RequestFactory().get(url)
+        request.user = AnonymousUser()
+        request.resolver_match = resolve(url)
+        return request
+
+    def legacy(self, name):
+        """Template name as it was before {% post_cards %}."""
+        source = self.engine.get_template(name).template.source
+        return self.engine.from_string(
+            source.replace('{% post_cards page_obj %}', LEGACY_LOOP)
+        )
+
+    def contexts(self):
+        return {
+            'posts/index.html': (
+                reverse('posts:index'), {}, Post.objects.feed()
+            ),
+            'posts/group_list.html': (
+                reverse('posts:group_list', args=[self.group.slug]),
+                {'group': self.group},
+                self.group.posts.feed(),
+            ),
+            'posts/profile.html': (
+                reverse('posts:profile', args=[self.author.username]),
+                {'author': self.author, 'following': False},
+                self.author.posts.feed(),
+            ),
+            'posts/follow.html': (
+                reverse('posts:follow_index'), {}, Post.objects.feed()
+            ),
+            'posts/hot.html': (
+                reverse('posts:hot_index'), {}, Post.objects.feed()
+            ),
+        }
+
+    def test_output_parity(self):
+        """Test feed pages match legacy templates, cold and cached."""
+        legacy_article = self.engine.from_string(LEGACY_ARTICLE)
+        for name, (url, extra, posts) in self.contexts().items():
+            request = self.request(url)
+            context = {**extra, 'page_obj': pages(posts, request)}
+            expected = self.legacy(name).render(
+                {**context, 'legacy_article': legacy_article}, request
+            )
+            template = self.engine.get_template(name)
+            for state in ('cold', 'cached'):
+                with self.subTest(template=name, cache=state):
+                    self.assertHTMLEqual(
+                        template.render(context, request), expected
+                    )
+
+    def test_cached_cards_one_lookup(self):
+        """Test cached cards take one lookup, no rendering or queries."""
+        request = self.request(reverse('posts:index'))
+        page_obj = pages(Post.objects.feed(), request)
+        template = self.engine.from_string(
+            '{% load post_cards %}{% post_cards page_obj %}'
+        )
+        first = template.render({'page_obj': page_obj}, request)
+        self.assertEqual(first.count('<article>'), len(self.posts))
+        self.assertEqual(first.count('<hr>'), len(self.posts) - 1)
+        fragments = fragment_cache()
+        with mock.patch.object(fragments, 'set_many') as set_many, \
+                mock.patch.object(
+                    fragments, 'get_many', wraps=fragments.get_many
+                ) as get_many, \
+                CaptureQueriesContext(connection) as queries:
+            second = template.render({'page_obj': page_obj}, request)
+        self.assertEqual(second, first)
+        set_many.assert_not_called()
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(len(queries), 0)
+
+    def test_card_changes_with_post_version(self):
+        """Test edited post gets a fresh card."""
+        request = self.request(reverse('posts:index'))
+        template = self.engine.from_string(
+            '{% load post_cards %}{% post_cards page_obj %}'
+        )
+        template.render(
+            {'page_obj': pages(Post.objects.feed(), request)}, request
+        )
+        Post.objects.filter(pk=self.posts[0].pk).update(
+            text='Правка', version=2
+        )
+        html = template.render(
+            {'page_obj': pages(Post.objects.feed(), request)}, request
+        )
+        self.assertIn('Правка', html)
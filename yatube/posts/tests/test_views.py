@@ -1,15 +1,31 @@
 from http import HTTPStatus
+from io import BytesIO, StringIO
 import shutil
+from itertools import product
 import tempfile
+from unittest import mock
+
+from PIL import Image
 
 from django import forms
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.budgets import BudgetTestMixin, load as load_budgets
 
-from ..models import Group, Post, User, Comment, Follow
+from .. import search, thumbnails
+from ..utils import CURSOR_PARAM, NEXT, PREVIOUS, encode_cursor
+from ..models import (
+    Comment, Follow, Group, Post, PostScore, TimelineEntry, User
+)
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -23,7 +39,7 @@ SMALL_GIF = (
 )
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, STREAMING_PAGES=False)
 class PostPagesTests(TestCase):
     """Test post pages."""
     @classmethod
@@ -229,21 +245,211 @@ class PostPagesTests(TestCase):
         self.assertNotIn(post, all_objects)
 
     def test_index_caches(self):
-        """Test cache working on index page."""
+        """Test index page is served from cache until posts change."""
+        url = reverse('posts:index')
+        response_old = self.authorized_client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.content, response_old.content)
         post_cache = Post.objects.create(
             author=self.user,
             text='Тестовый пост для проверки работы кэша',
         )
-        url = reverse('posts:index')
-        response_old = self.authorized_client.get(url)
+        response_new = self.authorized_client.get(url)
+        self.assertContains(response_new, post_cache.text)
         post_cache.delete()
+        response_deleted = self.authorized_client.get(url)
+        self.assertNotContains(response_deleted, post_cache.text)
+
+    def test_feed_cache_keys_and_timeout(self):
+        """Test only cursor varies cached pages, which expire in time."""
+        url = reverse('posts:index')
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.authorized_client.get(url, {'junk': 'x'})
+            self.assertFalse(any(
+                call.args[0].startswith('feed_page:')
+                for call in cache_set.call_args_list
+            ))
+            self.authorized_client.get(url)
+            pages = [
+                call for call in cache_set.call_args_list
+                if call.args[0].startswith('feed_page:')
+            ]
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(pages[0].args[2], settings.FEED_CACHE_TIMEOUT)
+        self.assertIsNotNone(settings.FEED_CACHE_TIMEOUT)
+
+    def test_generations_expire(self):
+        """Test generations of missing pages do not stay forever."""
+        url = reverse('posts:group_list', kwargs={'slug': 'missing'})
+        with mock.patch.object(cache, 'add', wraps=cache.add) as cache_add:
+            self.authorized_client.get(url)
+        timeouts = [
+            call.args[2] for call in cache_add.call_args_list
+            if call.args[0].startswith('generation:')
+        ]
+        self.assertTrue(timeouts)
+        for timeout in timeouts:
+            self.assertIsNotNone(timeout)
+            self.assertGreater(timeout, settings.FEED_CACHE_TIMEOUT)
+        with mock.patch.object(
+            cache, 'set_many', wraps=cache.set_many
+        ) as set_many:
+            Group.objects.get(pk=self.group.pk).save()
+        self.assertGreater(
+            set_many.call_args.args[1], settings.FEED_CACHE_TIMEOUT
+        )
+
+    def test_feed_cache_invalidated_by_post_events(self):
+        """Test group and profile caches drop on new post."""
+        for url in self.url_pages[1:]:
+            with self.subTest(url=url):
+                self.authorized_client.get(url)
+                post = Post.objects.create(
+                    author=self.user,
+                    group=self.group,
+                    text=f'Новый пост для {url}',
+                )
+                self.assertContains(self.authorized_client.get(url), post.text)
+
+    def test_feed_cache_not_shared_between_users(self):
+        """Test cached page of one user is not served to another."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        response = self.unauthorized_user.get(url)
+        self.assertNotContains(response, f'Пользователь: {self.user}')
+
+    def test_post_card_fragment_cache(self):
+        """Test post card is cached until post version changes."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.authorized_client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
         response = self.authorized_client.get(url)
-        self.assertEqual(response.content, response_old.content)
-        cache.clear()
-        response_new = self.authorized_client.get(url)
-        self.assertNotEqual(response.content, response_new.content)
+        self.assertContains(response, self.post.text)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Новый текст', 'group': self.group.pk},
+        )
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Новый текст')
+        self.assertNotContains(response, self.post.text)
+
+    def test_post_cards_follow_author_and_group_renames(self):
+        """Test cached cards show new author name and group title."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Переименованный'
+        author.save()
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Переименованная группа'
+        group.save()
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Автор: Переименованный')
+        self.assertContains(response, 'Переименованная группа')
+
+    def test_post_version_survives_concurrent_saves(self):
+        """Test both of two concurrent edits bump post version."""
+        first = Post.objects.get(pk=self.post.pk)
+        second = Post.objects.get(pk=self.post.pk)
+        first.save()
+        second.save()
+        self.assertEqual(second.version, self.post.version + 2)
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).version, self.post.version + 2
+        )
+
+    def test_post_saved_with_new_pk(self):
+        """Test post with a pk but no stored row is inserted as is."""
+        post = Post(pk=10_000, author=self.user, text='Свой ключ')
+        post.save()
+        self.assertEqual(Post.objects.get(pk=10_000).version, 1)
+        fixture = Post(
+            pk=10_001, author=self.user, text='Фикстура',
+            pub_date=self.post.pub_date,
+        )
+        fixture.save_base(raw=True)
+        self.assertEqual(Post.objects.get(pk=10_001).version, 1)
+
+    def test_login_keeps_post_cards(self):
+        """Test saves that do not touch names keep post versions."""
+        User.objects.get(pk=self.user.pk).save(update_fields=['last_login'])
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).version, self.post.version
+        )
+
+    def test_post_image_placeholder_until_variants_ready(self):
+        """Test original image is shown until variants are built."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.authorized_client.get(url)
+        self.assertContains(response, self.post.image.url)
+        self.assertTrue(thumbnails.generate(self.post.pk))
+        variants = Post.objects.get(pk=self.post.pk).variants
+        self.assertEqual(
+            [width for width, name in variants['sources']['image/jpeg']],
+            list(settings.POST_IMAGE_WIDTHS),
+        )
+        self.assertIn('image/webp', variants['sources'])
+        response = self.authorized_client.get(url)
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertFalse(thumbnails.generate(self.post.pk))
+
+    @override_settings(THUMBNAIL_ASYNC=False)
+    def test_post_create_builds_variants_in_sync_mode(self):
+        """Test post_create builds variants without worker pool."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(
+                    name='sync.gif',
+                    content=SMALL_GIF,
+                    content_type='image/gif',
+                ),
+            },
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertIsNotNone(post.variants)
 
+    def test_variants_dropped_with_new_image(self):
+        """Test variants of replaced image are ignored."""
+        thumbnails.generate(self.post.pk)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertIsNotNone(post.variants)
+        post.image = 'posts/other.gif'
+        self.assertIsNone(post.variants)
 
+    def test_variants_of_same_named_images_kept_apart(self):
+        """Test posts with images of one file name keep own variants."""
+        posts = []
+        for folder, color in (('one', 'red'), ('two', 'blue')):
+            buffer = BytesIO()
+            Image.new('RGB', (100, 100), color).save(buffer, 'JPEG')
+            name = default_storage.save(
+                f'posts/{folder}/cat.jpg', ContentFile(buffer.getvalue())
+            )
+            posts.append(Post.objects.create(
+                author=self.user, text=f'Кот {folder}', image=name
+            ))
+        for post in posts:
+            self.assertTrue(thumbnails.generate(post.pk))
+        for post, color in zip(posts, ((255, 0, 0), (0, 0, 255))):
+            variants = Post.objects.get(pk=post.pk).variants
+            (width, name), *_ = variants['sources']['image/jpeg']
+            with default_storage.open(name) as file, \
+                    Image.open(file) as image:
+                pixel = image.convert('RGB').getpixel((width // 2, 10))
+            for got, expected in zip(pixel, color):
+                self.assertAlmostEqual(got, expected, delta=10)
+
+    def test_warm_thumbnails_command(self):
+        """Test warm_thumbnails builds missing variants."""
+        call_command('warm_thumbnails', stdout=StringIO())
+        self.assertIsNotNone(Post.objects.get(pk=self.post.pk).variants)
+
+
+@override_settings(STREAMING_PAGES=False)
 class PaginatorViewsTest(TestCase):
     """Test paginator"""
     @classmethod
@@ -273,10 +479,10 @@ class PaginatorViewsTest(TestCase):
 
     def setUp(self):
         self.unauthorized_client = Client()
+        cache.clear()
 
     def test_paginator_on_pages(self):
         """Test paginator on pages."""
-        cache.clear()
         url_pages = [
             reverse('posts:index'),
             reverse('posts:group_list', kwargs={'slug': self.group.slug}),
@@ -284,16 +490,77 @@ class PaginatorViewsTest(TestCase):
         ]
         for url in url_pages:
             with self.subTest(url=url):
-                self.assertEqual(len(self.unauthorized_client.get(
-                    url).context.get('page_obj')),
-                    settings.COUNT_PER_PAGE
-                )
-                self.assertEqual(len(self.unauthorized_client.get(
-                    url + '?page=2').context.get('page_obj')),
-                    self.OVER_PAGE_POSTS
-                )
+                first_page = self.unauthorized_client.get(
+                    url).context.get('page_obj')
+                self.assertEqual(len(first_page), settings.COUNT_PER_PAGE)
+                second_page = self.unauthorized_client.get(
+                    url + '?' + first_page.next_query).context.get('page_obj')
+                self.assertEqual(len(second_page), self.OVER_PAGE_POSTS)
+                self.assertFalse(second_page.has_next())
+
+    def test_paginator_previous_page(self):
+        """Test cursor paginator goes back to the same first page."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        first_page = self.unauthorized_client.get(
+            url).context.get('page_obj')
+        second_page = self.unauthorized_client.get(
+            url + '?' + first_page.next_query).context.get('page_obj')
+        self.assertTrue(second_page.has_previous())
+        back_page = self.unauthorized_client.get(
+            url + '?' + second_page.previous_query).context.get('page_obj')
+        self.assertEqual(list(back_page), list(first_page))
+        self.assertFalse(back_page.has_previous())
+        self.assertTrue(set(second_page).isdisjoint(first_page))
+
+    def test_paginator_broken_cursor(self):
+        """Test broken cursor falls back to the first page."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        response = self.unauthorized_client.get(url + '?cursor=broken')
+        self.assertEqual(
+            len(response.context.get('page_obj')), settings.COUNT_PER_PAGE
+        )
+
+    def test_paginator_tampered_cursor(self):
+        """Test cursor with values of wrong type falls back to first page."""
+        reader = User.objects.create(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        client = Client()
+        client.force_login(reader)
+        post = Post.objects.first()
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:hot_index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+            reverse('posts:post_comments', kwargs={'post_id': post.pk}),
+            reverse('posts:api_index'),
+            reverse('posts:api_post_comments', kwargs={'post_id': post.pk}),
+        ]
+        payloads = [
+            ['garbage', 1], [{'x': 1}, 1], [[1], [2]], [None, None],
+            ['2021-01-01T00:00:00+00:00', 'x'], [1.5, {}],
+        ]
+        for url in urls:
+            for direction in (NEXT, PREVIOUS):
+                for values in payloads:
+                    with self.subTest(url=url, cursor=[direction, values]):
+                        cursor = encode_cursor(direction, values)
+                        response = client.get(url, {'cursor': cursor})
+                        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_paginator_skips_count(self):
+        """Test paginator does not count posts."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        with CaptureQueriesContext(connection) as queries:
+            self.unauthorized_client.get(url)
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries)
+        )
 
 
+@override_settings(STREAMING_PAGES=False)
 class FollowTest(TestCase):
     """Test followers."""
     @classmethod
@@ -392,6 +659,35 @@ class FollowTest(TestCase):
         response = new_client.get(reverse('posts:follow_index'))
         self.assertNotIn(post_test, response.context['page_obj'])
 
+    def test_new_post_pushed_to_follower_timeline(self):
+        """Test new post of followed author lands in timeline."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='new_text')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=new_post).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+
+    def test_unfollow_prunes_timeline(self):
+        """Test unfollow removes author posts from timeline."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists()
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertNotIn(self.post, response.context['page_obj'])
+
+    def test_rebuild_timelines_command(self):
+        """Test rebuild_timelines restores entries from follows."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=self.post).exists())
+
     def test_user_not_follow_yourself(self):
         """Test user not follow yourself."""
         count_before = Follow.objects.filter(
@@ -407,3 +703,433 @@ class FollowTest(TestCase):
                 user=self.follower, author=self.follower).count(),
             count_before
         )
+
+
+class FeedQueriesTest(BudgetTestMixin, TestCase):
+    """Test feed pages issue a fixed number of queries."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='feed_group',
+            description='Описание',
+        )
+        cls.author = User.objects.create(username='feed_author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+        self.urls = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': 'feed_author'}
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def count_queries(self):
+        counts = {}
+        for name, url in self.urls.items():
+            cache.clear()
+            with self.assertWithinBudget(name) as result:
+                self.client.get(url).getvalue()
+            counts[url] = len(result.queries)
+        return counts
+
+    def test_query_count_does_not_depend_on_posts(self):
+        """Test query count is the same for one and full page of posts."""
+        Post.objects.create(
+            author=self.author, group=self.group, text='Первый пост'
+        )
+        one_post = self.count_queries()
+        for number in range(settings.COUNT_PER_PAGE):
+            Post.objects.create(
+                author=self.author,
+                group=Group.objects.create(
+                    title=f'Группа {number}',
+                    slug=f'feed_group_{number}',
+                    description='Описание',
+                ) if number % 2 else self.group,
+                text=f'Пост {number}',
+            )
+        self.assertEqual(self.count_queries(), one_post)
+
+
+class QueryBudgetTest(BudgetTestMixin, TestCase):
+    """Test every page stays within budgets.json on seeded data."""
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_data', stdout=StringIO(), **load_budgets()['seed']
+        )
+        cls.follow = Follow.objects.select_related('user').first()
+        cls.post = Post.objects.filter(
+            group__isnull=False
+        ).select_related('author', 'group').first()
+
+    def setUp(self):
+        self.client.force_login(self.follow.user)
+
+    def test_pages_within_budget(self):
+        """Test queries and time of pages with full feeds."""
+        post = self.post
+        urls = {
+            'posts:index': reverse('posts:index'),
+            'posts:hot_index': reverse('posts:hot_index'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': post.group.slug}
+            ),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': post.author.username}
+            ),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}
+            ),
+            'posts:post_comments': reverse(
+                'posts:post_comments', kwargs={'post_id': post.pk}
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+            'posts:search': reverse('posts:search') + '?q=а*',
+            'posts:api_index': reverse('posts:api_index'),
+            'posts:api_post_detail': reverse(
+                'posts:api_post_detail', kwargs={'post_id': post.pk}
+            ),
+        }
+        self.assertEqual(set(urls), set(load_budgets()['views']))
+        for streaming, (name, url) in product((False, True), urls.items()):
+            with self.subTest(name=name, streaming=streaming), \
+                    self.settings(STREAMING_PAGES=streaming):
+                self.client.get(url).getvalue()
+                cache.clear()
+                # Streamed bodies are read inside, their queries count too
+                with self.assertWithinBudget(name):
+                    response = self.client.get(url)
+                    response.getvalue()
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class SearchTest(TestCase):
+    """Test full-text search."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='searcher')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пушкин написал красивое стихотворение'
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.user, text='Красивое небо над городом'
+        )
+        Comment.objects.create(
+            author=cls.user, post=cls.other_post, text='Лермонтов согласен'
+        )
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_queries(self):
+        """Test word, prefix, phrase and comment queries."""
+        cases = {
+            'пушкин': [self.post],
+            'стихотв*': [self.post],
+            '"написал красивое"': [self.post],
+            '"красивое написал"': [],
+            'лермонтов': [self.other_post],
+            'красивое небо': [self.other_post],
+            '': [],
+        }
+        for query, expected in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), expected)
+
+    def test_search_index_follows_changes(self):
+        """Test edited and deleted posts are reindexed."""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Совсем другой текст'
+        post.save()
+        self.assertEqual(self.search('пушкин'), [])
+        self.assertEqual(self.search('другой'), [post])
+        post.delete()
+        self.assertEqual(self.search('другой'), [])
+
+    def test_search_pagination(self):
+        """Test search results are paginated."""
+        Post.objects.bulk_create([
+            Post(author=self.user, text=f'Пагинация {number}')
+            for number in range(settings.COUNT_PER_PAGE + 2)
+        ])
+        for post in Post.objects.filter(text__startswith='Пагинация'):
+            post.save()
+        url = reverse('posts:search')
+        first_page = self.client.get(url, {'q': 'пагинация'}).context[
+            'page_obj']
+        self.assertEqual(len(first_page), settings.COUNT_PER_PAGE)
+        second_page = self.client.get(
+            url + '?' + first_page.next_query).context['page_obj']
+        self.assertEqual(len(second_page), 2)
+        self.assertTrue(set(second_page).isdisjoint(first_page))
+
+    def test_search_tampered_cursor(self):
+        """Test cursor position that is not a natural number is ignored."""
+        url = reverse('posts:search')
+        for position in ('abc', None, -5, 1.5, True, [1], {'a': 1}):
+            for direction in (NEXT, PREVIOUS):
+                with self.subTest(position=position, direction=direction):
+                    response = self.client.get(url, {
+                        'q': 'красивое',
+                        'cursor': encode_cursor(direction, [position]),
+                    })
+                    self.assertEqual(
+                        list(response.context['page_obj']),
+                        [self.post, self.other_post],
+                    )
+
+    def test_search_documents_keep_stable_rowids(self):
+        """Test reindexed documents replace their rows, not add new ones."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('Rowids are specific to the SQLite backend.')
+        post = Post.objects.get(pk=self.post.pk)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {search.TABLE}')
+            documents = cursor.fetchone()[0]
+            for _ in range(2):
+                post.save()
+            cursor.execute(f'SELECT COUNT(*) FROM {search.TABLE}')
+            self.assertEqual(cursor.fetchone()[0], documents)
+            cursor.execute(
+                f'SELECT object_id FROM {search.TABLE} WHERE rowid = %s',
+                [search.backend(connection).rowid(search.POST, post.pk)],
+            )
+            self.assertEqual(cursor.fetchone(), (post.pk,))
+        search.rebuild()
+        self.assertEqual(self.search('пушкин'), [post])
+
+    def test_admin_search_uses_index(self):
+        """Test admin search goes through the index."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'пушкин'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.post]
+        )
+
+
+@override_settings(HOT_SNAPSHOT_SECONDS=0)
+class HotFeedTest(TestCase):
+    """Test hot feed."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='hot_author')
+        cls.other_author = User.objects.create(username='cold_author')
+        cls.reader = User.objects.create(username='hot_reader')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+        cls.new_post = Post.objects.create(
+            author=cls.other_author, text='Новый'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def hot_posts(self):
+        response = self.client.get(reverse('posts:hot_index'))
+        return list(response.context['page_obj'])
+
+    @override_settings(COUNT_PER_PAGE=1)
+    def test_pages_keep_ranking_of_first_page(self):
+        """Test score changes between pages do not repeat or skip posts."""
+        url = reverse('posts:hot_index')
+        first = self.client.get(url).context['page_obj']
+        self.assertEqual(list(first), [self.new_post])
+        Comment.objects.create(
+            post=self.old_post, author=self.reader, text='Интересно'
+        )
+        second = self.client.get(
+            url, {CURSOR_PARAM: first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(second), [self.old_post])
+        self.assertFalse(second.has_next())
+        self.assertEqual(self.hot_posts(), [self.old_post])
+
+    def test_comment_lifts_post(self):
+        """Test commented post goes up."""
+        self.assertEqual(self.hot_posts(), [self.new_post, self.old_post])
+        Comment.objects.create(
+            post=self.old_post, author=self.reader, text='Интересно'
+        )
+        self.assertEqual(self.hot_posts(), [self.old_post, self.new_post])
+
+    def test_new_follower_lifts_author_posts(self):
+        """Test following author lifts recent author posts."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.hot_posts()[0], self.old_post)
+
+    def test_decay_hot_scores_command(self):
+        """Test decay halves scores every half-life."""
+        call_command(
+            'decay_hot_scores',
+            hours=settings.HOT_HALF_LIFE_HOURS,
+            stdout=StringIO(),
+        )
+        self.assertAlmostEqual(
+            PostScore.objects.get(post=self.old_post).score,
+            settings.HOT_POST_WEIGHT / 2,
+        )
+
+
+@override_settings(COMMENTS_PER_PAGE=2, STREAMING_PAGES=False)
+class CommentsPaginationTest(TestCase):
+    """Test comments on post page are paginated."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='commentator')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {number}'
+            )
+            for number in range(5)
+        ]
+
+    def test_first_batch_is_newest(self):
+        """Test post page shows newest comments only."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertEqual(
+            list(response.context['comments']), self.comments[:-3:-1]
+        )
+        self.assertContains(response, 'Комментариев:  <span >5</span>')
+
+    def test_load_more_fragment(self):
+        """Test fragment endpoint continues where the page stopped."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        seen = []
+        query = ''
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url + '?' + query)
+            self.assertTemplateUsed(response, 'includes/comments.html')
+            self.assertLessEqual(len(queries), 2)
+            seen += list(response.context['comments'])
+            if not response.context['comments'].has_next():
+                break
+            query = response.context['comments'].next_query
+        self.assertEqual(seen, self.comments[::-1])
+
+    def test_load_more_json(self):
+        """Test JSON batch of comments."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        data = self.client.get(url, {'format': 'json'}).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            ['Комментарий 4', 'Комментарий 3'],
+        )
+        self.assertEqual(data['comments'][0]['author_username'], 'commentator')
+        data = self.client.get(
+            url, {'format': 'json', 'cursor': data['next']}
+        ).json()
+        self.assertEqual(data['comments'][0]['text'], 'Комментарий 2')
+
+
+class ConditionalGetTest(TestCase):
+    """Test HTML pages answer 304 to unchanged polls."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='writer')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.urls = [
+            reverse('posts:group_list', kwargs={'slug': 'group'}),
+            reverse('posts:profile', kwargs={'username': 'writer'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+
+    def etags(self, client):
+        return [client.get(url)['ETag'] for url in self.urls]
+
+    def statuses(self, client, etags):
+        return [
+            client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+            for url, etag in zip(self.urls, etags)
+        ]
+
+    def test_not_modified_skips_view(self):
+        """Test matching ETag needs at most author lookup of the post."""
+        expected_queries = [0, 0, 1]
+        etags = self.etags(self.client)
+        for url, etag, expected in zip(self.urls, etags, expected_queries):
+            with self.subTest(url=url):
+                with self.assertNumQueries(expected):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response.content, b'')
+
+    def test_auth_state_changes_etag(self):
+        """Test logged in user does not get anonymous page."""
+        etags = self.etags(self.client)
+        reader_client = Client()
+        reader_client.force_login(self.reader)
+        self.assertEqual(
+            self.statuses(reader_client, etags), [HTTPStatus.OK] * 3
+        )
+
+    def test_new_csrf_token_refreshes_post_page(self):
+        """Test signed-in user gets comment form with current token."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        reader_client = Client()
+        reader_client.force_login(self.reader)
+        reader_client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        response = reader_client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        self.assertEqual(
+            reader_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            HTTPStatus.NOT_MODIFIED,
+        )
+        reader_client.cookies[settings.CSRF_COOKIE_NAME] = 'b' * 64
+        self.assertEqual(
+            reader_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            HTTPStatus.OK,
+        )
+        self.assertEqual(
+            reader_client.get(
+                url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+            ).status_code,
+            HTTPStatus.OK,
+        )
+
+    def test_changes_change_etag(self):
+        """Test edits, comments and follows invalidate pages."""
+        etags = self.etags(self.client)
+        Comment.objects.create(post=self.post, author=self.reader, text='Да')
+        self.assertEqual(self.statuses(self.client, etags), [
+            HTTPStatus.NOT_MODIFIED, HTTPStatus.NOT_MODIFIED, HTTPStatus.OK,
+        ])
+        etags = self.etags(self.client)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.statuses(self.client, etags), [
+            HTTPStatus.NOT_MODIFIED, HTTPStatus.OK, HTTPStatus.OK,
+        ])
+        etags = self.etags(self.client)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Правка'
+        post.save()
+        self.assertEqual(
+            self.statuses(self.client, etags), [HTTPStatus.OK] * 3
+        )
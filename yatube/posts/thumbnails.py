@@ -0,0 +1,123 @@
+import hashlib
+import io
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from PIL import Image, ImageOps
+
+from core import routers
+
+from . import cache
+from .models import Post
+
+WIDTH = 960
+HEIGHT = 339
+VARIANTS_DIR = 'posts/variants'
+FORMATS = (
+    ('AVIF', 'image/avif', 'avif'),
+    ('WEBP', 'image/webp', 'webp'),
+    ('JPEG', 'image/jpeg', 'jpg'),
+)
+
+logger = logging.getLogger(__name__)
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def supported_formats():
+    """Output formats this Pillow build can encode, best first."""
+    Image.init()
+    return [fmt for fmt in FORMATS if fmt[0] in Image.SAVE]
+
+
+def variants_stem(post):
+    """Name prefix of post variants, unique per post and image."""
+    digest = hashlib.md5(post.image.name.encode()).hexdigest()[:8]
+    stem = os.path.splitext(os.path.basename(post.image.name))[0]
+    return f'{VARIANTS_DIR}/{post.pk}-{digest}-{stem}'
+
+
+def build_variants(post):
+    """Save center crops of post image in every width and format.
+
+    Returns metadata that templates turn into <picture> sources. Files
+    are named after the post, so posts never share or delete them.
+    """
+    image = post.image
+    with image.open('rb'), Image.open(image) as source:
+        source = ImageOps.exif_transpose(source).convert('RGB')
+    stem = variants_stem(post)
+    sources = {}
+    for width in settings.POST_IMAGE_WIDTHS:
+        height = round(width * HEIGHT / WIDTH)
+        variant = ImageOps.fit(source, (width, height), Image.LANCZOS)
+        for fmt, mime, extension in supported_formats():
+            buffer = io.BytesIO()
+            variant.save(
+                buffer, fmt, quality=settings.POST_IMAGE_QUALITY
+            )
+            name = f'{stem}-{width}.{extension}'
+            default_storage.delete(name)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            sources.setdefault(mime, []).append([width, name])
+    return {
+        'image': image.name,
+        'width': WIDTH,
+        'height': HEIGHT,
+        'sources': sources,
+    }
+
+
+def generate(post_id):
+    """Build post image variants and drop pages showing the original."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image or post.variants:
+        return False
+    variants = json.dumps(build_variants(post))
+    Post.objects.filter(pk=post_id).update(
+        image_variants=variants,
+        version=F('version') + 1,
+    )
+    cache.bump(*cache.post_scopes(post))
+    return True
+
+
+def _generate_in_worker(post_id):
+    close_old_connections()
+    # Job runs right after the commit, replicas may not have the post yet
+    routers.pin_to_primary()
+    try:
+        generate(post_id)
+    except Exception:
+        logger.exception('Image variants for post %s failed', post_id)
+    finally:
+        routers.reset()
+        close_old_connections()
+
+
+def schedule(post):
+    """Build post image variants off the request path."""
+    if not post.image:
+        return
+    if not settings.THUMBNAIL_ASYNC:
+        generate(post.pk)
+        return
+    transaction.on_commit(
+        lambda: executor().submit(_generate_in_worker, post.pk)
+    )
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name: str = 'posts'
 
@@ -9,6 +9,10 @@ urlpatterns = [
         '',
         views.index,
         name='index'),
+    path(
+        'hot/',
+        views.hot_index,
+        name='hot_index'),
     path(
         'group/<slug:slug>/',
         views.group_posts,
@@ -28,6 +32,11 @@ urlpatterns = [
         views.post_edit,
         name='post_edit'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
@@ -37,6 +46,10 @@ urlpatterns = [
         'create/',
         views.post_create,
         name='post_create'),
+    path(
+        'search/',
+        views.post_search,
+        name='search'),
     path(
         'follow/',
         views.follow_index,
@@ -46,6 +59,34 @@ urlpatterns = [
         views.profile_follow,
         name='profile_follow'
     ),
+    path(
+        'api/posts/',
+        api.index,
+        name='api_index'),
+    path(
+        'api/posts/<int:post_id>/',
+        api.post_detail,
+        name='api_post_detail'
+    ),
+    path(
+        'api/posts/<int:post_id>/comments/',
+        api.post_comments,
+        name='api_post_comments'
+    ),
+    path(
+        'api/group/<slug:slug>/',
+        api.group_posts,
+        name='api_group_list'
+    ),
+    path(
+        'api/profile/<str:username>/',
+        api.profile,
+        name='api_profile'
+    ),
+    path(
+        'api/follow/',
+        api.follow_index,
+        name='api_follow_index'),
     path(
         'profile/<str:username>/unfollow/',
         views.profile_unfollow,
@@ -1,9 +1,318 @@
-from django.core.paginator import Paginator
+import base64
+import json
+
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils.functional import cached_property
+
+from .models import Comment
+
+CURSOR_PARAM = 'cursor'
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, values):
+    """Pack direction and key values into opaque cursor."""
+    raw = json.dumps([direction, values], default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Unpack cursor, return (direction, values) or None if broken."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded))
+    except (TypeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or not isinstance(values, list):
+        return None
+    return direction, values
+
+
+class CursorPage:
+    """Page of keyset paginated objects."""
+
+    def __init__(self, object_list, paginator, request,
+                 has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.request = request
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @cached_property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return encode_cursor(
+            NEXT, self.paginator.key_values(self.object_list[-1]))
+
+    @cached_property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return encode_cursor(
+            PREVIOUS, self.paginator.key_values(self.object_list[0]))
+
+    def _query(self, cursor):
+        if self.request is None:
+            params = QueryDict(mutable=True)
+        else:
+            params = self.request.GET.copy()
+        params.pop(CURSOR_PARAM, None)
+        params.pop('page', None)
+        if cursor:
+            params[CURSOR_PARAM] = cursor
+        return params.urlencode()
+
+    @property
+    def first_query(self):
+        return self._query(None)
+
+    @property
+    def next_query(self):
+        return self._query(self.next_cursor)
+
+    @property
+    def previous_query(self):
+        return self._query(self.previous_cursor)
+
+
+class StreamedPage(CursorPage):
+    """Cursor page fetched while the response is streamed.
+
+    Objects come from queryset.iterator() in chunks, object_list holds
+    only the current chunk. has_next and cursors are known once all
+    chunks are done.
+    """
+
+    def __init__(self, queryset, paginator, request, has_previous):
+        super().__init__(
+            [], paginator, request,
+            has_next=False, has_previous=has_previous,
+        )
+        # Keep the database picked for this request, chunks are read
+        # after middleware has finished.
+        self.queryset = queryset.using(queryset.db)
+        self.first = self.last = None
+        self.last_chunk = True
+        self.slot = None
+
+    def chunks(self, size):
+        """Fill object_list with each chunk of the page in turn."""
+        rows = self.queryset[:self.paginator.per_page + 1].iterator(size)
+        chunk = []
+        for number, obj in enumerate(rows):
+            if number == self.paginator.per_page:
+                self._has_next = True
+                break
+            if len(chunk) == size:
+                yield self._fill(chunk, last=False)
+                chunk = []
+            chunk.append(obj)
+        if chunk:
+            yield self._fill(chunk, last=True)
+
+    def _fill(self, chunk, last):
+        self.object_list = chunk
+        self.last_chunk = last
+        if self.first is None:
+            self.first = chunk[0]
+        self.last = chunk[-1]
+        return chunk
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return encode_cursor(NEXT, self.paginator.key_values(self.last))
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or self.first is None:
+            return None
+        return encode_cursor(
+            PREVIOUS, self.paginator.key_values(self.first))
+
+
+class CursorPaginator:
+    """Keyset paginator over descending unique key tuple.
+
+    No COUNT and no OFFSET: every page is a range scan that starts
+    right after the last key of the neighbour page.
+    """
+
+    def __init__(self, queryset, per_page, keys=('pub_date', 'pk')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.keys = keys
+
+    def key_values(self, obj):
+        """Get key tuple of object or values() row."""
+        if isinstance(obj, dict):
+            return [obj[key] for key in self.keys]
+        return [getattr(obj, key) for key in self.keys]
+
+    def _field(self, key):
+        annotation = self.queryset.query.annotations.get(key)
+        if annotation is not None:
+            return annotation.output_field
+        if key == 'pk':
+            return self.queryset.model._meta.pk
+        return self.queryset.model._meta.get_field(key)
+
+    def clean_values(self, values):
+        """Key values of cursor as their field types, None if invalid."""
+        if len(values) != len(self.keys):
+            return None
+        cleaned = []
+        for key, value in zip(self.keys, values):
+            try:
+                value = self._field(key).to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                return None
+            if value is None:
+                return None
+            cleaned.append(value)
+        return cleaned
+
+    def _after(self, values, lookup):
+        condition = Q()
+        for position, key in enumerate(self.keys):
+            step = Q(**{f'{key}__{lookup}': values[position]})
+            for prev_key, prev_value in zip(self.keys, values[:position]):
+                step &= Q(**{prev_key: prev_value})
+            condition |= step
+        return condition
+
+    def get_page(self, cursor=None, request=None, stream=False):
+        """Page after cursor.
+
+        With stream, forward pages are StreamedPage and read nothing
+        until streamed. Backward pages are always read at once.
+        """
+        decoded = decode_cursor(cursor) if cursor else None
+        if decoded is not None:
+            values = self.clean_values(decoded[1])
+            decoded = None if values is None else (decoded[0], values)
+        size = self.per_page
+        if decoded is None or decoded[0] == NEXT:
+            queryset = self.queryset.order_by(*(f'-{k}' for k in self.keys))
+            if decoded is not None:
+                queryset = queryset.filter(self._after(decoded[1], 'lt'))
+            has_previous = decoded is not None
+            if stream:
+                return StreamedPage(queryset, self, request, has_previous)
+            items = list(queryset[:size + 1])
+            return CursorPage(
+                items[:size], self, request,
+                has_next=len(items) > size, has_previous=has_previous,
+            )
+        values = decoded[1]
+        items = list(
+            self.queryset.filter(self._after(values, 'gt'))
+            .order_by(*self.keys)[:size + 1]
+        )
+        has_previous = len(items) > size
+        items = items[:size]
+        items.reverse()
+        return CursorPage(
+            items, self, request,
+            has_next=True, has_previous=has_previous,
+        )
+
+
+def cursor_snapshot(cursor):
+    """Snapshot token of ranked cursor, None if it has none."""
+    decoded = decode_cursor(cursor) if cursor else None
+    if decoded and len(decoded[1]) == 2 and isinstance(decoded[1][1], str):
+        return decoded[1][1]
+    return None
+
+
+class RankedPaginator:
+    """Paginator over ids in rank order, e.g. search results.
+
+    Cursor holds position in the ranked list instead of key values,
+    and the snapshot token of the list when it is given.
+    """
+
+    def __init__(self, queryset, ids, per_page, snapshot=None):
+        self.queryset = queryset
+        self.ids = ids
+        self.per_page = per_page
+        self.snapshot = snapshot
+        self.positions = {pk: position for position, pk in enumerate(ids)}
+
+    def key_values(self, obj):
+        values = [self.positions[obj.pk]]
+        if self.snapshot is not None:
+            values.append(self.snapshot)
+        return values
+
+    def _objects(self, ids):
+        objects = self.queryset.in_bulk(ids)
+        return [objects[pk] for pk in ids if pk in objects]
+
+    def get_page(self, cursor=None, request=None):
+        decoded = decode_cursor(cursor) if cursor else None
+        start = 0
+        if decoded and len(decoded[1]) in (1, 2):
+            direction, (position, *_) = decoded
+            # bool is an int subclass, JSON true must not pass
+            valid = type(position) is int and position >= 0
+            if valid and direction == NEXT:
+                start = position + 1
+            elif valid:
+                start = max(position - self.per_page, 0)
+        start = min(start, len(self.ids))
+        end = start + self.per_page
+        return CursorPage(
+            self._objects(self.ids[start:end]), self, request,
+            has_next=end < len(self.ids), has_previous=start > 0,
+        )
+
+
+def pages(post_list, request, keys=('pub_date', 'pk'), stream=False):
+    paginator = CursorPaginator(post_list, settings.COUNT_PER_PAGE, keys)
+    return paginator.get_page(
+        request.GET.get(CURSOR_PARAM), request, stream=stream
+    )
 
 
-def pages(post_list, request):
-    paginator = Paginator(post_list, settings.COUNT_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+def comment_pages(post_id, request, comments=None, stream=False):
+    """Newest comments of post, keyset paginated."""
+    if comments is None:
+        comments = Comment.objects.select_related('author')
+    paginator = CursorPaginator(
+        comments.filter(post_id=post_id),
+        settings.COMMENTS_PER_PAGE,
+        keys=('pub_date', 'id'),
+    )
+    return paginator.get_page(
+        request.GET.get(CURSOR_PARAM), request, stream=stream
+    )
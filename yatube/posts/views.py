@@ -1,40 +1,74 @@
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.conf import settings
+from django.db.models import F
 
 from .models import Post, Group, User, Follow
 from .forms import PostForm, CommentForm
-from .utils import pages
-
-
-@cache_page(20, key_prefix='index_page')
+from .utils import (
+    CURSOR_PARAM, RankedPaginator, comment_pages, cursor_snapshot, pages
+)
+from . import api, hot, search, streaming, thumbnails
+from .cache import (
+    cache_feed, conditional_feed, detail_scope, edge_cache, index_scope,
+    group_scope, profile_scope, timeline_scope
+)
+
+
+@edge_cache(index_scope)
+@cache_feed(index_scope)
 def index(request):
     """Main page."""
-    post_list = Post.objects.all()
-    page_obj = pages(post_list, request)
+    post_list = Post.objects.feed()
+    page_obj = pages(post_list, request, stream=settings.STREAMING_PAGES)
     context = {
         'page_obj': page_obj,
     }
-    return render(request, 'posts/index.html', context)
+    return streaming.render(request, 'posts/index.html', context)
+
+
+def hot_index(request):
+    """Posts ranked by recent engagement, paged over a ranking snapshot."""
+    cursor = request.GET.get(CURSOR_PARAM)
+    snapshot, ids = hot.snapshot(cursor_snapshot(cursor))
+    paginator = RankedPaginator(
+        Post.objects.feed(), ids, settings.COUNT_PER_PAGE, snapshot
+    )
+    context = {
+        'page_obj': paginator.get_page(cursor, request),
+    }
+    return render(request, 'posts/hot.html', context)
 
 
+@edge_cache(group_scope)
+@conditional_feed(group_scope)
+@cache_feed(group_scope)
 def group_posts(request, slug):
     """Posts page."""
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = pages(post_list, request)
+    post_list = group.posts.feed()
+    page_obj = pages(post_list, request, stream=settings.STREAMING_PAGES)
     context = {
         'group': group,
         'page_obj': page_obj,
     }
-    return render(request, 'posts/group_list.html', context)
+    return streaming.render(request, 'posts/group_list.html', context)
 
 
+@edge_cache(profile_scope)
+@conditional_feed(profile_scope)
+@cache_feed(profile_scope)
 def profile(request, username):
     """User profile."""
-    author = get_object_or_404(User, username=username)
-    author_posts = author.posts.all()
-    page_obj = pages(author_posts, request)
+    author = get_object_or_404(
+        User.objects.select_related('counters'),
+        username=username
+    )
+    author_posts = author.posts.feed()
+    page_obj = pages(
+        author_posts, request, stream=settings.STREAMING_PAGES
+    )
     following = (
         request.user.is_authenticated
         and request.user.follower.filter(author=author).exists()
@@ -44,20 +78,38 @@ def profile(request, username):
         'page_obj': page_obj,
         'following': following,
     }
-    return render(request, 'posts/profile.html', context)
+    return streaming.render(request, 'posts/profile.html', context)
 
 
+@edge_cache(detail_scope)
+@conditional_feed(detail_scope, form=True)
 def post_detail(request, post_id):
     """Post detail."""
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.feed().select_related('author__counters'),
+        pk=post_id
+    )
     form = CommentForm()
     context = {
         'post': post,
-        'comments': comments,
+        'comments': comment_pages(
+            post.pk, request, stream=settings.STREAMING_PAGES
+        ),
         'form': form
     }
-    return render(request, 'posts/post_detail.html', context)
+    return streaming.render(request, 'posts/post_detail.html', context)
+
+
+def post_comments(request, post_id):
+    """Next batch of post comments as HTML fragment or JSON."""
+    post = get_object_or_404(Post, pk=post_id)
+    if request.GET.get('format') == 'json':
+        return JsonResponse(api.comments_data(post_id, request))
+    context = {
+        'post': post,
+        'comments': comment_pages(post_id, request),
+    }
+    return render(request, 'includes/comments.html', context)
 
 
 @login_required
@@ -72,6 +124,7 @@ def post_create(request):
         temp_form = form.save(commit=False)
         temp_form.author = request.user
         temp_form.save()
+        thumbnails.schedule(temp_form)
         return redirect('posts:profile', temp_form.author)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -90,7 +143,7 @@ def post_edit(request, post_id):
     )
 
     if form.is_valid():
-        form.save()
+        thumbnails.schedule(form.save())
         return redirect('posts:post_detail', post_id)
     return render(
         request,
@@ -114,15 +167,41 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def post_search(request):
+    """Full-text search over posts and comments."""
+    query = request.GET.get('q', '').strip()
+    paginator = RankedPaginator(
+        Post.objects.feed(),
+        search.post_ids(query, settings.SEARCH_MAX_RESULTS),
+        settings.COUNT_PER_PAGE,
+    )
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(
+            request.GET.get(CURSOR_PARAM), request
+        ),
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@cache_feed(timeline_scope)
 def follow_index(request):
     """List follow posts."""
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = pages(post_list, request)
+    post_list = Post.objects.feed().filter(
+        timeline__user=request.user
+    ).annotate(
+        feed_date=F('timeline__pub_date'),
+        feed_id=F('timeline__id'),
+    )
+    page_obj = pages(
+        post_list, request, keys=('feed_date', 'feed_id'),
+        stream=settings.STREAMING_PAGES,
+    )
     context = {
         'page_obj': page_obj,
     }
-    return render(request, 'posts/follow.html', context)
+    return streaming.render(request, 'posts/follow.html', context)
 
 
 @login_required
@@ -0,0 +1,7 @@
+"""Settings profile is chosen by YATUBE_ENV: dev (default) or prod."""
+import os
+
+if os.getenv('YATUBE_ENV', 'dev') == 'prod':
+    from .prod import *  # noqa: F401,F403
+else:
+    from .dev import *  # noqa: F401,F403
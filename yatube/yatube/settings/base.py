@@ -0,0 +1,261 @@
+import os
+import tempfile
+
+from core.cache import cache_config
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = '&)ato^l=u!g_%8+w&f4qi5#_(n#xhwom+44n46us(ez3i^mf1q'
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+# Allowed Hosts
+ALLOWED_HOSTS = [
+    'localhost',
+    '127.0.0.1',
+    '[::1]',
+    'testserver',
+]
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'posts.apps.PostsConfig',
+    'users.apps.UsersConfig',
+    'core.apps.CoreConfig',
+    'about.apps.AboutConfig',
+    'sorl.thumbnail',
+]
+
+MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilerMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'core.middleware.PrimaryStickinessMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+
+STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [TEMPLATES_DIR],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'core.context_processors.year.year',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+
+# Database
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv(
+            'YATUBE_DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')
+        ),
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_CONN_MAX_AGE', 0)),
+    }
+}
+
+# Read replicas: comma separated database files, e.g.
+# YATUBE_DB_REPLICAS=/var/lib/yatube/replica1.sqlite3,/var/lib/...
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+    filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(',')), 1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+# Reads of a client stay on the primary for a while after its write
+REPLICA_STICKY_COOKIE = 'db_primary'
+REPLICA_STICKY_SECONDS = 10
+
+
+# Password validation
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+INTERNAL_IPS = [
+    '127.0.0.1',
+]
+
+# Internationalization
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+STATIC_URL = '/static/'
+
+LOGIN_URL = 'users:login'
+
+LOGIN_REDIRECT_URL = 'posts:index'
+
+
+# Email
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+# Const for number of posts per page
+COUNT_PER_PAGE = 10
+
+# Const for CSRF failure redirect
+CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Media files
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Enable caches. Examples of YATUBE_CACHE_URL:
+# locmem://, file:///var/tmp/yatube, memcached://127.0.0.1:11211,
+# tiered+memcached://127.0.0.1:11211 (local LRU in front of memcached)
+CACHES = cache_config(
+    os.getenv('YATUBE_CACHE_URL', 'locmem://'),
+    local_max_entries=int(os.getenv('YATUBE_CACHE_LOCAL_ENTRIES', 1000)),
+    sync_interval=float(os.getenv('YATUBE_CACHE_SYNC_INTERVAL', 1)),
+)
+
+# Feed pages are dropped when their generation changes. Orphaned
+# pages of old generations expire after a day.
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Post image variants are built by a thread pool after commit.
+# Set THUMBNAIL_ASYNC=0 to build them synchronously.
+THUMBNAIL_ASYNC = os.getenv('THUMBNAIL_ASYNC', '1') == '1'
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+
+# Widths and quality of responsive post image variants
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_QUALITY = 80
+
+# Upload limits of post images: bigger pictures are scaled down,
+# metadata is stripped and the result is re-encoded.
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_MAX_SIDE = 2048
+POST_IMAGE_MAX_FRAMES = 300
+POST_IMAGE_UPLOAD_QUALITY = 85
+
+# Bigger uploads are streamed to a temporary file
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+
+# Max number of ranked search results
+SEARCH_MAX_RESULTS = 1000
+
+# Hot feed: engagement weights and score half-life
+HOT_POST_WEIGHT = 1
+HOT_COMMENT_WEIGHT = 3
+HOT_FOLLOW_WEIGHT = 2
+HOT_FOLLOW_WINDOW_DAYS = 3
+HOT_HALF_LIFE_HOURS = 12
+HOT_DECAY_HOURS = 1
+HOT_MIN_SCORE = 0.01
+# Hot feed pages come from a ranking snapshot: a new one is taken every
+# HOT_SNAPSHOT_SECONDS, readers already paging keep theirs for
+# HOT_SNAPSHOT_TIMEOUT. Only the first HOT_SNAPSHOT_SIZE posts are paged.
+HOT_SNAPSHOT_SECONDS = 60
+HOT_SNAPSHOT_TIMEOUT = 60 * 60
+HOT_SNAPSHOT_SIZE = 1000
+
+# Comments per batch on post page
+COMMENTS_PER_PAGE = 20
+
+# Feeds and post page are streamed: head and header go out before
+# posts or comments are read, then items follow in chunks.
+# Set YATUBE_STREAMING=1 to turn it on.
+STREAMING_PAGES = os.getenv('YATUBE_STREAMING', '0') == '1'
+STREAM_CHUNK_SIZE = 5
+
+# Anonymous feed pages are shared by caching proxy for EDGE_CACHE_SECONDS.
+# Set YATUBE_EDGE_PURGE_URL to purge them by Surrogate-Key on changes.
+EDGE_CACHE_SECONDS = int(os.getenv('YATUBE_EDGE_CACHE_SECONDS', 300))
+EDGE_PURGE_URL = os.getenv('YATUBE_EDGE_PURGE_URL')
+EDGE_PURGE_METHOD = os.getenv('YATUBE_EDGE_PURGE_METHOD', 'PURGE')
+EDGE_PURGE_TIMEOUT = 2
+# Purges are sent by a worker thread, EDGE_PURGE_ASYNC=0 sends them
+# on commit. Longer key lists are split into several requests.
+EDGE_PURGE_ASYNC = os.getenv('YATUBE_EDGE_PURGE_ASYNC', '1') == '1'
+EDGE_PURGE_MAX_HEADER = 4096
+
+# Per-view request metrics at /internal/metrics/ in Prometheus format.
+# With YATUBE_METRICS_DIR set every worker shares its numbers there,
+# so any worker answers with totals of all of them. The page is served
+# only with "Authorization: Bearer <YATUBE_METRICS_TOKEN>".
+METRICS_ENABLED = os.getenv('YATUBE_METRICS', '1') == '1'
+METRICS_DIR = os.getenv('YATUBE_METRICS_DIR')
+METRICS_FLUSH_SECONDS = 10
+METRICS_TOKEN = os.getenv('YATUBE_METRICS_TOKEN')
+
+# Opt-in request profiler. PROFILER_SAMPLE_RATE of requests run under
+# cProfile, requests slower than PROFILER_SLOW_MS are caught by a stack
+# sampler. See them with "manage.py profiles".
+PROFILER_ENABLED = os.getenv('YATUBE_PROFILER', '0') == '1'
+PROFILER_SAMPLE_RATE = float(os.getenv('YATUBE_PROFILER_SAMPLE_RATE', 0))
+PROFILER_SLOW_MS = float(os.getenv('YATUBE_PROFILER_SLOW_MS', 1000))
+PROFILER_INTERVAL = 0.005
+PROFILER_DIR = os.getenv(
+    'YATUBE_PROFILER_DIR',
+    os.path.join(tempfile.gettempdir(), 'yatube-profiles'),
+)
+PROFILER_KEEP = 500
+PROFILER_MAX_QUERIES = 200
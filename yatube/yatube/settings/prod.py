@@ -0,0 +1,44 @@
+import os
+
+from .base import *  # noqa: F401,F403
+from .base import DATABASES, TEMPLATES
+
+DEBUG = False
+
+SECRET_KEY = os.environ['YATUBE_SECRET_KEY']
+
+ALLOWED_HOSTS = os.getenv('YATUBE_ALLOWED_HOSTS', 'localhost').split(',')
+
+# Keep database connections open between requests
+DATABASES = {
+    alias: {
+        **database,
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_CONN_MAX_AGE', 60)),
+    }
+    for alias, database in DATABASES.items()
+}
+
+# Templates are compiled once per worker
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'context_processors': [
+            processor
+            for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+            if processor != 'django.template.context_processors.debug'
+        ],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+# Session and messages live in signed cookies: no session table lookup
+# on every request of a logged in user.
+SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'